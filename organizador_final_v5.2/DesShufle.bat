@@ -9,7 +9,9 @@ echo Iniciando el servidor del Organizador de Archivos en segundo plano...
 REM CAMBIO IMPORTANTE:
 REM Usar 'START /B' para lanzar el servidor de Python en segundo plano
 REM (invisible) y permitir que esta ventana se cierre inmediatamente.
-START "" /B py app.py
+REM Se importa app.py en vez de ejecutarlo directo: así Python reutiliza el
+REM app.pyc ya compilado (__pycache__) y la app abre más rápido.
+START "" /B py -c "import app; app.main()"
 
 REM El script 'app.py' se encargará de abrir el navegador.
 REM Esta ventana .bat se cerrará ahora.
@@ -7,10 +7,21 @@
 #
 # 2. Para leer los perfiles de todos los usuarios, es mejor
 #    ejecutar este script como Administrador.
+#
+# 3. (Opcional) Con pyarrow la caché del log se guarda en Parquet
+#    (si no, en pickle):
+#    pip install pyarrow
 # -----------------------------------------------------------------
 
 import pandas as pd
 import os
+import io
+import json
+import hashlib
+import pickle
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import warnings
 
@@ -24,9 +35,165 @@ ADMIN_LOG_CSV = ADMIN_LOG_DIR / "admin_log.csv"
 USERS_DIR = Path.home().parent  # Esto usualmente nos lleva a C:\Users
 APP_DATA_SUBPATH = "AppData/Roaming/OrganizadorMaterias/perfiles.csv"
 
+# 3. Caché local del log: cada análisis solo lee las filas nuevas del CSV
+CACHE_DIR = ADMIN_LOG_DIR / "cache_analisis"
+CACHE_META = CACHE_DIR / "admin_log_cache.json"
+CACHE_MAX_PARTES = 16        # Más partes que esto se juntan en una sola
+CACHE_HUELLA_BYTES = 64 * 1024 # Bytes del inicio del CSV para saber si se reescribió
+
+try:
+    import pyarrow  # noqa: F401 (solo para saber si hay Parquet)
+    CACHE_FORMATO = "parquet"
+except ImportError:
+    CACHE_FORMATO = "pickle"
+
+# 4. Caché de perfiles por usuario: {usuario: (mtime_ns, tamaño, DataFrame)}
+PERFILES_CACHE = CACHE_DIR / "perfiles_cache.pkl"
+PERFILES_HILOS = 16 # Carpetas de usuario que se revisan a la vez
+
+# app.py guarda los perfiles con columnas en español; el análisis usa estos nombres
+PERFIL_COLUMNAS = {
+    'id_perfil': 'profile_id',
+    'nombre_visible': 'profile_name',
+    'ultimo_uso_timestamp': 'last_used_timestamp',
+    'creado_en_timestamp': 'created_timestamp',
+    'manejo_otros': 'others_handling',
+}
+
+# 5. Resúmenes diarios del log: nombre de la tabla -> columna que agrupa
+RESUMENES_CACHE = CACHE_DIR / "resumenes.pkl"
+RESUMENES = {
+    'por_usuario': 'username',
+    'por_perfil': 'profile_id',
+    'por_materia': 'subject_assigned',
+    'por_hora': 'log_hora',
+    'por_status': 'status',
+}
+
+# Tipos fijos al leer: las columnas repetitivas como categorías ocupan mucho menos
+LOG_CATEGORIAS = ['username', 'action', 'profile_id', 'subject_assigned', 'status']
+LOG_DTYPES = {**{columna: 'category' for columna in LOG_CATEGORIAS},
+              'timestamp': 'string', 'file_size_bytes': 'float64'}
+
 # Ignorar advertencias comunes de Pandas
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
+# --- Caché incremental del log ---
+# admin_log.csv solo crece al final. La caché guarda lo ya leído en "partes"
+# (Parquet o pickle) y una marca de agua: hasta qué byte del CSV se leyó.
+# Cada análisis solo parsea lo que se agregó después de esa marca.
+
+def _leer_pedazo_csv(datos: bytes) -> pd.DataFrame:
+    """Un pedazo del CSV (encabezado + filas) a DataFrame, con tipos fijos y ETL."""
+    df = pd.read_csv(io.BytesIO(datos), dtype=LOG_DTYPES, encoding='utf-8')
+    # --- Limpieza de Datos Esencial (ETL) ---
+    # Convertir timestamps a objetos de fecha para análisis de series de tiempo
+    # (app.py escribe la columna 'timestamp' con isoformat; una fila por acción o por archivo movido)
+    df['log_timestamp'] = pd.to_datetime(df.pop('timestamp'), format='ISO8601', errors='coerce')
+    # Bytes a entero para poder sumar (filas de versiones viejas vienen vacías)
+    df['file_size_bytes'] = df['file_size_bytes'].fillna(0).astype('int64')
+    return df
+
+def _leer_meta_cache():
+    try:
+        with open(CACHE_META, mode='r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _guardar_meta_cache(meta: dict):
+    """Se escribe al final y de forma atómica: si algo falla, la caché anterior sigue valiendo."""
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=".meta_", suffix=".tmp")
+    with open(fd, mode='w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp_path, CACHE_META)
+
+def _guardar_parte(df: pd.DataFrame, nombre: str):
+    if CACHE_FORMATO == "parquet":
+        df.to_parquet(CACHE_DIR / nombre, index=False)
+    else:
+        df.to_pickle(CACHE_DIR / nombre)
+
+def _leer_parte(nombre: str) -> pd.DataFrame:
+    if CACHE_FORMATO == "parquet":
+        return pd.read_parquet(CACHE_DIR / nombre)
+    return pd.read_pickle(CACHE_DIR / nombre)
+
+def _nueva_parte(meta: dict, df: pd.DataFrame) -> str:
+    nombre = f"parte_{meta['siguiente_parte']:06d}.{CACHE_FORMATO}"
+    meta['siguiente_parte'] += 1
+    _guardar_parte(df, nombre)
+    return nombre
+
+def _borrar_partes(nombres: list):
+    for nombre in nombres:
+        try:
+            os.remove(CACHE_DIR / nombre)
+        except OSError:
+            pass
+
+def _juntar_partes(meta: dict, encabezado: bytes) -> pd.DataFrame:
+    partes = [_leer_parte(nombre) for nombre in meta['partes']]
+    if not partes:
+        return _leer_pedazo_csv(encabezado)
+    df_log = pd.concat(partes, ignore_index=True)
+    for columna in LOG_CATEGORIAS: # concat pierde la categoría si las partes tienen categorías distintas
+        df_log[columna] = df_log[columna].astype('category')
+    return df_log
+
+def actualizar_cache_log():
+    """
+    Parsea solo las filas nuevas del CSV y las agrega a la caché.
+    Si el CSV se reescribió (otro encabezado, otra huella o más corto que la
+    marca de agua, p. ej. al actualizar el formato), la caché se arma de cero.
+    Devuelve (meta, encabezado, filas nuevas o None, marca de agua anterior).
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(ADMIN_LOG_CSV, mode='rb') as f:
+        encabezado = f.readline()
+        tamano = os.fstat(f.fileno()).st_size
+        meta = _leer_meta_cache()
+        if meta is not None:
+            f.seek(0)
+            huella = hashlib.sha1(f.read(min(meta['marca_agua'], CACHE_HUELLA_BYTES))).hexdigest()
+        if (meta is None or meta.get('formato') != CACHE_FORMATO or
+                meta['encabezado'] != encabezado.decode('utf-8') or
+                meta['marca_agua'] > tamano or meta['huella'] != huella):
+            if meta is not None:
+                print("  > El log cambió desde la última vez: se vuelve a leer completo.")
+                _borrar_partes(meta.get('partes', []))
+            meta = {"formato": CACHE_FORMATO, "encabezado": encabezado.decode('utf-8'),
+                    "generacion": uuid.uuid4().hex, # Cambia cada vez que la caché se arma de cero
+                    "marca_agua": len(encabezado), "huella": "", "partes": [], "siguiente_parte": 0}
+        marca_anterior = meta['marca_agua']
+        f.seek(marca_anterior)
+        cola = f.read(tamano - marca_anterior)
+        # Una fila a medio escribir (la app sigue abierta) se deja para la próxima vez
+        cola = cola[:cola.rfind(b'\n') + 1]
+        meta['marca_agua'] += len(cola)
+        f.seek(0)
+        meta['huella'] = hashlib.sha1(f.read(min(meta['marca_agua'], CACHE_HUELLA_BYTES))).hexdigest()
+
+    nuevas = None
+    if cola:
+        nuevas = _leer_pedazo_csv(encabezado + cola)
+        meta['partes'].append(_nueva_parte(meta, nuevas))
+        print(f"  > {len(nuevas)} filas nuevas desde el último análisis.")
+
+    if len(meta['partes']) > CACHE_MAX_PARTES: # Juntar todo en una sola parte
+        viejas = meta['partes']
+        meta['partes'] = [_nueva_parte(meta, _juntar_partes(meta, encabezado))]
+        _guardar_meta_cache(meta)
+        _borrar_partes(viejas)
+    else:
+        _guardar_meta_cache(meta)
+    return meta, encabezado, nuevas, marca_anterior
+
+def cargar_log_incremental() -> pd.DataFrame:
+    """Devuelve el log completo, parseando solo las filas nuevas desde la última vez."""
+    meta, encabezado, _, _ = actualizar_cache_log()
+    return _juntar_partes(meta, encabezado)
+
 def cargar_log_admin() -> pd.DataFrame:
     """Carga el log principal de transacciones (admin_log.csv)"""
     print(f"Cargando log de administrador desde: {ADMIN_LOG_CSV}")
@@ -35,14 +202,8 @@ def cargar_log_admin() -> pd.DataFrame:
         return pd.DataFrame()
 
     try:
-        df_log = pd.read_csv(ADMIN_LOG_CSV)
-        
-        # --- Limpieza de Datos Esencial (ETL) ---
-        # Convertir timestamps a objetos de fecha para análisis de series de tiempo
-        df_log['log_timestamp'] = pd.to_datetime(df_log['log_timestamp'])
-        
-        # Convertir bytes a numérico para poder sumar
-        df_log['file_size_bytes'] = pd.to_numeric(df_log['file_size_bytes'], errors='coerce').fillna(0)
+        # Solo se parsea lo nuevo; lo demás viene de la caché ya con tipos
+        df_log = cargar_log_incremental()
         
         # Añadir columnas útiles
         df_log['log_hora'] = df_log['log_timestamp'].dt.hour
@@ -56,31 +217,157 @@ def cargar_log_admin() -> pd.DataFrame:
         print(f"Error al leer {ADMIN_LOG_CSV}: {e}")
         return pd.DataFrame()
 
+# --- Resúmenes (rollups) del log ---
+# Tablas chicas por día: acciones y bytes por usuario, perfil, materia, hora
+# y status. Se actualizan solo con las filas nuevas; el reporte lee de aquí
+# en vez de agrupar el historial completo en cada corrida.
+
+def calcular_resumenes(df_log: pd.DataFrame) -> dict:
+    """Agrega un pedazo del log en las tablas de RESUMENES."""
+    df = df_log.assign(fecha=df_log['log_timestamp'].dt.normalize(),
+                       log_hora=df_log['log_timestamp'].dt.hour)
+    resumenes = {}
+    for nombre, columna in RESUMENES.items():
+        resumenes[nombre] = (df.groupby(['fecha', columna], observed=True, dropna=False)
+                               .agg(acciones=('file_size_bytes', 'size'), bytes=('file_size_bytes', 'sum'))
+                               .reset_index())
+    return resumenes
+
+def juntar_resumenes(viejos: dict, nuevos: dict) -> dict:
+    """Suma dos juegos de resúmenes (por ejemplo, lo guardado + las filas nuevas)."""
+    juntos = {}
+    for nombre, columna in RESUMENES.items():
+        tabla = pd.concat([viejos[nombre], nuevos[nombre]], ignore_index=True)
+        juntos[nombre] = (tabla.groupby(['fecha', columna], observed=True, dropna=False)
+                               [['acciones', 'bytes']].sum().reset_index())
+    return juntos
+
+def cargar_resumenes() -> dict:
+    """
+    Resúmenes al día con el log. Se guardan junto con la generación y la marca
+    de agua de la caché del log a la que corresponden: si no coinciden (la caché
+    se armó de cero o una corrida anterior se cortó a medias), se recalculan
+    desde el log completo; si coinciden, solo se suman las filas nuevas.
+    """
+    print(f"Cargando log de administrador desde: {ADMIN_LOG_CSV}")
+    if not ADMIN_LOG_CSV.exists():
+        print(f"ERROR: No se encontró el archivo de log. ¿Se ha ejecutado la app al menos una vez?")
+        return {}
+    try:
+        meta, encabezado, nuevas, marca_anterior = actualizar_cache_log()
+        try:
+            with open(RESUMENES_CACHE, mode='rb') as f:
+                guardado = pickle.load(f)
+        except Exception:
+            guardado = None
+
+        version = (meta['generacion'], meta['marca_agua'])
+        if guardado is not None and guardado['version'] == version:
+            resumenes = guardado['tablas']
+        elif (guardado is not None and nuevas is not None and
+              guardado['version'] == (meta['generacion'], marca_anterior)):
+            resumenes = juntar_resumenes(guardado['tablas'], calcular_resumenes(nuevas))
+        else:
+            print("  > Calculando resúmenes desde el log completo...")
+            resumenes = calcular_resumenes(_juntar_partes(meta, encabezado))
+
+        if guardado is None or guardado['version'] != version:
+            fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=".resumenes_", suffix=".tmp")
+            with open(fd, mode='wb') as f:
+                pickle.dump({'version': version, 'tablas': resumenes}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, RESUMENES_CACHE)
+
+        print(f"Log de administrador cargado. {int(resumenes['por_usuario']['acciones'].sum())} acciones registradas.")
+        return resumenes
+
+    except Exception as e:
+        print(f"Error al leer {ADMIN_LOG_CSV}: {e}")
+        return {}
+
+def _leer_perfil_usuario(perfil_path: Path, usuario: str) -> pd.DataFrame:
+    """Lee el perfiles.csv de un usuario y lo deja listo para juntar con los demás."""
+    df_perfil_usuario = pd.read_csv(perfil_path, dtype={'id_perfil': 'string'})
+    df_perfil_usuario = df_perfil_usuario.rename(columns=PERFIL_COLUMNAS)
+    # --- Limpieza de Datos Esencial (ETL) ---
+    for columna in ('last_used_timestamp', 'created_timestamp'):
+        if columna in df_perfil_usuario:
+            df_perfil_usuario[columna] = pd.to_datetime(df_perfil_usuario[columna], format='ISO8601',
+                                                        errors='coerce')
+    # Añadir una columna para saber a quién pertenece este perfil
+    df_perfil_usuario['propietario_perfil'] = usuario
+    return df_perfil_usuario
+
+def _revisar_usuario(user_dir: str, usuario: str, cache: dict):
+    """
+    Corre en el pool: un solo stat decide si el perfil existe y si cambió.
+    Devuelve (usuario, (mtime_ns, tamaño, df) o None, 'nuevo'/'sin cambios'/error).
+    """
+    perfil_path = Path(user_dir) / APP_DATA_SUBPATH
+    try:
+        st = os.stat(perfil_path)
+    except OSError: # Sin perfil (o sin permiso para verlo)
+        return usuario, None, None
+    anterior = cache.get(usuario)
+    if anterior is not None and anterior[:2] == (st.st_mtime_ns, st.st_size):
+        return usuario, anterior, "sin cambios"
+    try:
+        return usuario, (st.st_mtime_ns, st.st_size, _leer_perfil_usuario(perfil_path, usuario)), "nuevo"
+    except Exception as e:
+        return usuario, None, f"Error al leer perfil {perfil_path}: {e}"
+
+def _leer_cache_perfiles() -> dict:
+    try:
+        with open(PERFILES_CACHE, mode='rb') as f:
+            return pickle.load(f)
+    except Exception: # Sin caché, o de otra versión de pandas: se vuelve a leer todo
+        return {}
+
+def _guardar_cache_perfiles(cache: dict):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=".perfiles_", suffix=".tmp")
+        with open(fd, mode='wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, PERFILES_CACHE)
+    except OSError as e:
+        print(f"  > No se pudo guardar la caché de perfiles: {e}")
+
 def cargar_todos_los_perfiles() -> pd.DataFrame:
     r"""
     Escanea C:\Users para encontrar todos los perfiles.csv de todos los usuarios
     y los consolida en una sola tabla.
+    Las carpetas se revisan en paralelo y el perfil de cada usuario se guarda
+    en caché por fecha de modificación: los que no cambiaron no se vuelven a leer.
     """
     print(f"\nBuscando perfiles de usuario en: {USERS_DIR}")
+    try:
+        with os.scandir(USERS_DIR) as entries:
+            usuarios = sorted((entry.name, entry.path) for entry in entries if entry.is_dir())
+    except OSError as e:
+        print(f"No se pudo leer {USERS_DIR}: {e}")
+        return pd.DataFrame()
+
+    cache = _leer_cache_perfiles()
+    with ThreadPoolExecutor(max_workers=PERFILES_HILOS) as pool:
+        resultados = list(pool.map(lambda u: _revisar_usuario(u[1], u[0], cache), usuarios))
+
+    nuevo_cache = {}
     perfiles_encontrados = []
-    
-    # Iterar sobre cada carpeta en C:\Users
-    for user_dir in USERS_DIR.iterdir():
-        if not user_dir.is_dir():
+    leidos = 0
+    for usuario, guardado, estado in resultados: # En orden alfabético, igual en cada corrida
+        if guardado is None:
+            if estado:
+                print(f"  > {estado}")
             continue
-            
-        perfil_path = user_dir / APP_DATA_SUBPATH
-        
-        if perfil_path.exists():
-            try:
-                # Leer el CSV de este usuario
-                df_perfil_usuario = pd.read_csv(perfil_path)
-                # Añadir una columna para saber a quién pertenece este perfil
-                df_perfil_usuario['propietario_perfil'] = user_dir.name
-                perfiles_encontrados.append(df_perfil_usuario)
-                print(f"  > Perfil encontrado para el usuario: {user_dir.name}")
-            except Exception as e:
-                print(f"  > Error al leer perfil {perfil_path}: {e}")
+        nuevo_cache[usuario] = guardado
+        perfiles_encontrados.append(guardado[2])
+        if estado == "nuevo":
+            leidos += 1
+            print(f"  > Perfil encontrado para el usuario: {usuario}")
+    if leidos or nuevo_cache.keys() != cache.keys():
+        _guardar_cache_perfiles(nuevo_cache)
+    if len(perfiles_encontrados) > leidos:
+        print(f"  > {len(perfiles_encontrados) - leidos} perfiles sin cambios (desde la caché).")
                 
     if not perfiles_encontrados:
         print("No se encontró ningún archivo de perfil.")
@@ -89,26 +376,31 @@ def cargar_todos_los_perfiles() -> pd.DataFrame:
     # Consolidar todos los dataframes de perfiles en uno solo
     df_perfiles_total = pd.concat(perfiles_encontrados, ignore_index=True)
     
-    # --- Limpieza de Datos Esencial (ETL) ---
-    df_perfiles_total['last_used_timestamp'] = pd.to_datetime(df_perfiles_total['last_used_timestamp'])
-    df_perfiles_total['created_timestamp'] = pd.to_datetime(df_perfiles_total['created_timestamp'])
-    
     print(f"Perfiles consolidados. {len(df_perfiles_total)} perfiles encontrados en total.")
     return df_perfiles_total
 
-def ejecutar_analisis(df_log, df_perfiles):
-    """Ejecuta y muestra los KPIs principales"""
+def _total_gb(tabla: pd.DataFrame, columna: str) -> pd.Series:
+    return tabla.groupby(columna, observed=True)['bytes'].sum() / (1024**3)
+
+def _conteos(tabla: pd.DataFrame, columna: str) -> pd.Series:
+    return tabla.groupby(columna, observed=True)['acciones'].sum()
+
+def ejecutar_analisis(resumenes: dict, df_perfiles):
+    """Ejecuta y muestra los KPIs principales (desde los resúmenes, no del log completo)"""
     
-    if df_log.empty:
+    if not resumenes or resumenes['por_usuario'].empty:
         print("\nNo hay datos de log para analizar.")
         return
 
+    por_usuario = resumenes['por_usuario']
+    por_perfil = resumenes['por_perfil']
+
     # --- Análisis del Log (KPIs de Actividad) ---
     print("\n--- ANÁLISIS DE ACTIVIDAD (admin_log.csv) ---")
     
-    total_acciones = len(df_log)
-    total_gb = df_log['gb_organizados'].sum()
-    usuarios_activos = df_log['username'].nunique()
+    total_acciones = int(por_usuario['acciones'].sum())
+    total_gb = por_usuario['bytes'].sum() / (1024**3)
+    usuarios_activos = por_usuario['username'].nunique()
     
     print(f"\nKPIs Generales:")
     print(f"  - Total de acciones (archivos procesados): {total_acciones}")
@@ -116,16 +408,16 @@ def ejecutar_analisis(df_log, df_perfiles):
     print(f"  - Usuarios únicos activos:                {usuarios_activos}")
 
     print(f"\nActividad por Usuario (TOP 5):")
-    print(df_log.groupby('username')['gb_organizados'].sum().nlargest(5).to_markdown(floatfmt=".4f"))
+    print(_total_gb(por_usuario, 'username').rename('gb_organizados').nlargest(5).to_markdown(floatfmt=".4f"))
 
     print(f"\nMaterias Más Organizadas (TOP 10):")
-    print(df_log['subject_assigned'].value_counts().nlargest(10).to_markdown(header=["Materia", "Conteos"]))
+    print(_conteos(resumenes['por_materia'], 'subject_assigned').nlargest(10).to_markdown(headers=["Materia", "Conteos"]))
 
     print(f"\nResultados de Acciones (Status):")
-    print(df_log['status'].value_counts().to_markdown(header=["Status", "Conteos"]))
+    print(_conteos(resumenes['por_status'], 'status').sort_values(ascending=False).to_markdown(headers=["Status", "Conteos"]))
 
     print(f"\nHoras Pico de Uso (0-23h):")
-    print(df_log['log_hora'].value_counts().sort_index().to_markdown(header=["Hora", "Conteos"]))
+    print(_conteos(resumenes['por_hora'], 'log_hora').sort_index().to_markdown(headers=["Hora", "Conteos"]))
 
     # --- Análisis Combinado (Merge) ---
     if df_perfiles.empty:
@@ -134,8 +426,11 @@ def ejecutar_analisis(df_log, df_perfiles):
         
     print("\n--- ANÁLISIS COMBINADO (Log + Perfiles) ---")
     
-    # ¡La magia del merge!
-    df_combinado = pd.merge(df_log, df_perfiles, on='profile_id', how='left', suffixes=('_log', '_perfil'))
+    # El merge se hace con el resumen por perfil (unas filas por día), no con todo el log
+    gb_por_perfil = por_perfil.groupby('profile_id', observed=True)['bytes'].sum().reset_index()
+    gb_por_perfil['profile_id'] = gb_por_perfil['profile_id'].astype('string')
+    gb_por_perfil['gb_organizados'] = gb_por_perfil.pop('bytes') / (1024**3)
+    df_combinado = pd.merge(gb_por_perfil, df_perfiles, on='profile_id', how='left', suffixes=('_log', '_perfil'))
     
     print(f"\nActividad por Nombre de Perfil (TOP 5):")
     # Usamos profile_name de la tabla de perfiles
@@ -156,12 +451,12 @@ if __name__ == "__main__":
     print("  Reporte de Análisis de 'Desshufle' v1.0  ")
     print("=============================================")
     
-    # 1. Cargar los dos datasets
-    df_log = cargar_log_admin()
+    # 1. Cargar los dos datasets (el log ya resumido; cargar_log_admin() da el log completo)
+    resumenes = cargar_resumenes()
     df_perfiles = cargar_todos_los_perfiles()
     
     # 2. Ejecutar el análisis
-    ejecutar_analisis(df_log, df_perfiles)
+    ejecutar_analisis(resumenes, df_perfiles)
     
     print("\n--- Fin del Análisis ---")
     
\ No newline at end of file
@@ -4,22 +4,51 @@
 # 3. Quitamos la función main() y los 'input()'
 # 4. Añadimos las "puertas" (rutas API) para que el HTML se comunique.
 
+import time
+STARTUP_STARTED = time.perf_counter() # Para el reporte de arranque (ver mark_startup)
+
 import os
+import sys
+import select
+import socket
+import struct
+import atexit
 import shutil
+import stat
 from pathlib import Path
-import time
 import unicodedata
 import re
-import csv
+import fnmatch
+import tempfile
+import hashlib
 from datetime import datetime
-import getpass
 import json # Necesario para enviar datos al HTML
-import webbrowser # Para abrir el navegador
-import threading # Para abrir el navegador después de que inicie Flask
+import queue
+from functools import lru_cache
+import threading
+import uuid
+from array import array
+from collections import deque
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+# Se importan donde se usan, para que la app abra más rápido: csv, getpass,
+# webbrowser, sqlite3, ProcessPoolExecutor y extractor_contenido.
 
 # --- Importaciones de Flask ---
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response
 from flask_cors import CORS
+from werkzeug.serving import ThreadedWSGIServer
+
+# --- Reporte de arranque ---
+# Segundos desde que empezó a cargar app.py hasta cada etapa del arranque
+# (se imprime al terminar el precalentamiento y sale en /api/metrics).
+STARTUP_TIMES = {}
+
+def mark_startup(stage: str):
+    """Anota cuándo se llegó a 'stage' (solo la primera vez)."""
+    STARTUP_TIMES.setdefault(stage, round(time.perf_counter() - STARTUP_STARTED, 4))
+
+mark_startup("importaciones")
 
 # --- Configuración de Flask ---
 app = Flask(__name__)
@@ -30,15 +59,58 @@ CORS(app)
 # --- Constantes Globales (Las mismas de v5.2) ---
 APP_DATA_DIR = Path(os.environ.get('APPDATA', Path.home())) / "OrganizadorMaterias"
 PERFILES_CSV = APP_DATA_DIR / "perfiles.csv"
+CONTENT_CACHE_DB = APP_DATA_DIR / "contenido_cache.sqlite" # Texto ya extraído (ver ContentClassifier)
+CHECKPOINTS_DIR = APP_DATA_DIR / "checkpoints" # Un JSON por perfil (ver ScanCheckpoint)
+JOURNAL_DIR = APP_DATA_DIR / "journal" # Bitácoras de movimientos por corrida (ver MoveJournal)
 ADMIN_LOG_DIR = Path(os.environ.get('PROGRAMDATA', 'C:/ProgramData')) / "OrganizadorMaterias"
 ADMIN_LOG_CSV = ADMIN_LOG_DIR / "admin_log.csv"
 MATERIAS_SEPARATOR = "|"
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 5000 # templates/index.html usa este puerto
+SERVER_THREADS = int(os.environ.get('ORGANIZADOR_HILOS_SERVIDOR', 8)) # Peticiones atendidas a la vez
+REPLACE_RETRIES = 5 # Intentos de os.replace si Windows tiene el archivo abierto (antivirus, analizador)
+MAX_MOVE_WORKERS = 16 # Tope de hilos para mover archivos en paralelo
+PROFILE_FLUSH_DELAY = 2.0 # Segundos que espera el guardado en segundo plano de contadores
+PLAN_CACHE_LIMIT = 5 # Vistas previas guardadas a la vez
+PLAN_TTL = 600 # Segundos que una vista previa sigue siendo aplicable
+JOURNAL_SYNC_EVERY = 256 # Registros de bitácora entre cada fsync
+JOURNAL_SYNC_INTERVAL = 1.0 # Segundos máximos sin fsync de la bitácora
+JOURNAL_HISTORY_LIMIT = 20 # Bitácoras terminadas que se guardan por perfil
+METRICS_HISTORY_LIMIT = 100 # Corridas que guarda el historial de /api/metrics
+JOB_STREAM_INTERVAL = 0.5 # Segundos entre eventos de progreso (SSE)
+RECURSIVE_MAX_DEPTH = 8 # Niveles de subcarpetas que revisa el modo recursivo
+RECURSIVE_WALK_WORKERS = 4 # Hilos que leen subcarpetas en paralelo
+DUPLICATE_MODES = ('renombrar', 'descartar', 'enlazar') # Qué hacer con un archivo idéntico a uno del destino
+DEDUPE_PARTIAL_BYTES = 64 * 1024 # Bytes del hash rápido antes del hash completo
+DEDUPE_CHUNK_SIZE = 1024 * 1024
+CONTENT_READ_LIMIT = 64 * 1024 # Bytes del inicio de cada archivo que se leen para clasificar por contenido
+CONTENT_WORKERS = min(4, os.cpu_count() or 1) # Procesos que extraen texto
+CONTENT_CACHE_TIMEOUT = 5.0 # Segundos que se espera si otra corrida está escribiendo en la caché
+WATCH_DEBOUNCE = 1.5 # Segundos sin cambios antes de mover un archivo nuevo
+WATCH_POLL_INTERVAL = 2.0 # Cada cuánto se revisa la carpeta si no hay inotify
+WATCH_LOG_LIMIT = 200 # Líneas de log recientes que guarda cada vigilancia
+WATCH_IGNORED_SUFFIXES = ('.crdownload', '.part', '.partial', '.download', '.tmp')
+RUN_LOG_BUFFER_BYTES = 256 * 1024 # Log de corrida en memoria antes de pasar a disco (ver RunLog)
+RUN_LOG_INDEX_EVERY = 256 # Eventos entre cada entrada del índice del log
+RUN_LOG_TAIL = 200 # Últimas líneas del log que van dentro de la respuesta
+RUN_LOG_PAGE_LIMIT = 1000 # Líneas por página de /api/run-log/<id>
+RUN_LOG_HISTORY_LIMIT = 20 # Logs de corridas que se pueden seguir consultando
+NORMALIZE_CACHE_SIZE = 65536 # Nombres normalizados que se recuerdan
+NORMALIZE_CACHE_MAX_LENGTH = 260 # Más largo que esto (contenido de archivos) no entra a la caché
+DUPLICATE_SUFFIX_RE = re.compile(r' \(\d+\)$') # El " (n)" final de un nombre repetido
 PROFILE_FIELDNAMES = [
     'id_perfil', 'nombre_visible', 'lista_materias_pipe', 'ruta_origen', 
     'ruta_destino', 'nombre_carpeta_principal', 'ultimo_uso_timestamp', 
     'creado_en_timestamp', 'contador_archivos_movidos', 'manejo_otros'
 ]
-ADMIN_LOG_FIELDNAMES = ['timestamp', 'username', 'action']
+ADMIN_LOG_FIELDNAMES = [
+    'timestamp', 'username', 'action',
+    # Columnas por archivo (las usa "analizador de datos.py"); vacías en acciones generales
+    'profile_id', 'subject_assigned', 'file_size_bytes', 'status'
+]
+ADMIN_LOG_QUEUE_SIZE = 10000    # Filas en espera como máximo antes de descartar
+ADMIN_LOG_FLUSH_INTERVAL = 1.0  # Segundos entre escrituras del log de admin
+ADMIN_LOG_BATCH_SIZE = 500      # Filas por cada append al CSV
 
 # --- Funciones de Ayuda (Imprimir con color en la TERMINAL) ---
 # Estas son útiles para *nosotros* (desarrolladores) para ver qué pasa en el servidor
@@ -51,8 +123,23 @@ def print_warning(message: str):
 def print_success(message: str):
     print(f"\n\033[92m [✓] ÉXITO: {message}\033[0m")
 
-# --- Funciones de Log de Administrador (Sin cambios de v5.2) ---
+def replace_file(tmp_path, final_path):
+    """
+    os.replace con reintentos: en Windows falla con PermissionError si otro
+    proceso (antivirus, el analizador de datos) tiene el archivo abierto justo en ese momento.
+    """
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(tmp_path, final_path)
+            return
+        except PermissionError:
+            if attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+# --- Funciones de Log de Administrador ---
 def setup_admin_log():
+    import csv
     try:
         os.makedirs(ADMIN_LOG_DIR, exist_ok=True)
         if not ADMIN_LOG_CSV.exists():
@@ -60,54 +147,403 @@ def setup_admin_log():
                 writer = csv.DictWriter(f, fieldnames=ADMIN_LOG_FIELDNAMES)
                 writer.writeheader()
             print_success(f"Log de Administrador creado en: {ADMIN_LOG_CSV}")
+        else:
+            upgrade_admin_log()
     except PermissionError:
         print_error("¡Fallo de permisos al crear el Log de Administrador!")
         print_warning("Por favor, ejecuta este script UNA VEZ 'Como Administrador' para habilitar el log.")
     except Exception as e:
         print_error(f"Error desconocido al crear el log: {e}")
 
-def log_admin_action(action: str):
+def upgrade_admin_log():
+    """Si el log es de una versión anterior (menos columnas), reescribe el encabezado."""
+    import csv
+    with open(ADMIN_LOG_CSV, mode='r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames == ADMIN_LOG_FIELDNAMES:
+            return
+        rows = list(reader)
+    fd, tmp_path = tempfile.mkstemp(dir=ADMIN_LOG_DIR, prefix=".admin_log_", suffix=".tmp")
+    with open(fd, mode='w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=ADMIN_LOG_FIELDNAMES, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    replace_file(tmp_path, ADMIN_LOG_CSV)
+    print_success("Log de Administrador actualizado al nuevo formato.")
+
+@lru_cache(maxsize=1)
+def current_username() -> str:
+    """getpass.getuser() no cambia mientras corre la app: se calcula una vez."""
+    import getpass
+    return getpass.getuser()
+
+class AdminLogWriter:
+    """
+    Escritor del log de administrador en segundo plano.
+
+    Las filas entran a una cola acotada (no bloquea el ciclo de movimientos)
+    y un hilo las escribe por lotes: un solo open/append por lote, cada
+    ADMIN_LOG_FLUSH_INTERVAL segundos o cuando se junta un lote lleno.
+    Si la cola está llena la fila se descarta y se cuenta; el hilo avisa
+    cuántas se perdieron al escribir el siguiente lote.
+    close() (registrado con atexit) vacía la cola antes de salir.
+
+    'setup' (setup_admin_log) corre en el mismo hilo antes del primer lote:
+    crear el CSV no retrasa el arranque y ninguna fila llega antes del encabezado.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: Path, queue_size: int = ADMIN_LOG_QUEUE_SIZE,
+                 flush_interval: float = ADMIN_LOG_FLUSH_INTERVAL, batch_size: int = ADMIN_LOG_BATCH_SIZE,
+                 setup=None):
+        self.path = path
+        self.setup = setup
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._dropped_reported = 0
+        self._dropped_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def write(self, row: dict):
+        """Encola una fila sin esperar. Si la cola está llena, se descarta y se cuenta."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def close(self):
+        """Escribe lo pendiente y detiene el hilo."""
+        if self._thread is None:
+            return
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._thread = None
+        self._report_dropped()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="admin-log", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        if self.setup is not None:
+            self.setup()
+        while True:
+            batch = []
+            stop = False
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                if item is self._STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+                    # Juntar todo lo que ya esté esperando, hasta un lote
+                    while len(batch) < self.batch_size:
+                        item = self._queue.get_nowait()
+                        if item is self._STOP:
+                            stop = True
+                            break
+                        batch.append(item)
+            except queue.Empty:
+                pass
+            if batch:
+                self._append(batch)
+                self._report_dropped()
+            if stop:
+                return
+
+    def _report_dropped(self):
+        """Avisa cuántas filas se descartaron desde el último aviso."""
+        with self._dropped_lock:
+            missing = self.dropped - self._dropped_reported
+            self._dropped_reported = self.dropped
+        if missing:
+            print_warning(f"El log de admin va atrasado: se descartaron {missing} filas "
+                          f"({self.dropped} en total).")
+
+    def _append(self, rows: list):
+        import csv
+        try:
+            with open(self.path, mode='a', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=ADMIN_LOG_FIELDNAMES)
+                writer.writerows(rows)
+        except (IOError, PermissionError):
+            pass 
+        except Exception as e:
+            print_warning(f"No se pudo escribir en el log de admin: {e}")
+
+ADMIN_LOG = AdminLogWriter(ADMIN_LOG_CSV, setup=setup_admin_log)
+atexit.register(ADMIN_LOG.close)
+
+def log_admin_action(action: str, profile_id: str = "", subject_assigned: str = "",
+                     file_size_bytes: int = 0, status: str = ""):
+    """Registra una acción en el log de admin (en segundo plano, no espera al disco)."""
     try:
-        username = getpass.getuser()
-        timestamp = datetime.now().isoformat()
-        with open(ADMIN_LOG_CSV, mode='a', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=ADMIN_LOG_FIELDNAMES)
-            writer.writerow({
-                'timestamp': timestamp,
-                'username': username,
-                'action': action
-            })
-    except (IOError, PermissionError):
-        pass 
+        ADMIN_LOG.write({
+            'timestamp': datetime.now().isoformat(),
+            'username': current_username(),
+            'action': action,
+            'profile_id': profile_id,
+            'subject_assigned': subject_assigned,
+            'file_size_bytes': file_size_bytes,
+            'status': status,
+        })
     except Exception as e:
         print_warning(f"No se pudo escribir en el log de admin: {e}")
 
 # --- Funciones de Lógica de Archivos (Sin cambios de v5.2) ---
 def normalize_text(text: str) -> str:
+    """
+    Minúsculas, sin acentos y solo [a-z0-9._] (lo demás pasa a '_').
+    Los mismos nombres se repiten en cada corrida, así que el resultado se
+    guarda en caché. Los textos largos (contenido de archivos) no se guardan.
+    """
     if not isinstance(text, str):
         return ""
-    text = ''.join(
-        c for c in unicodedata.normalize('NFD', text.lower())
-        if unicodedata.category(c) != 'Mn'
-    )
-    text = re.sub(r'[^a-z0-9\._]+', '_', text).strip('_')
-    return text
+    if len(text) > NORMALIZE_CACHE_MAX_LENGTH:
+        return _normalize_uncached(text)
+    return _normalize_cached(text)
+
+def _strip_accents_nfd(text: str) -> str:
+    """La forma original: descomponer (NFD) y quitar las marcas de acento."""
+    return ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
+
+# Latín, acentos sueltos y puntuación (guiones, comillas). Ahí quitar acentos
+# carácter por carácter da lo mismo que NFD sobre el texto completo.
+_LATIN_RANGES = ((0x00, 0x24F), (0x300, 0x36F), (0x1E00, 0x1EFF), (0x2000, 0x206F))
+
+def _build_latin_table() -> dict:
+    """Carácter latino -> el mismo carácter pasado por _strip_accents_nfd ('á' -> 'a')."""
+    table = {}
+    for first, last in _LATIN_RANGES:
+        for code in range(max(first, 0x80), last + 1):
+            stripped = _strip_accents_nfd(chr(code))
+            if stripped != chr(code):
+                table[code] = stripped
+    return table
+
+_LATIN_TABLE = _build_latin_table()
+_LATIN_ONLY_RE = re.compile('[%s]*' % ''.join(f'\\u{first:04x}-\\u{last:04x}' for first, last in _LATIN_RANGES))
+_NORMALIZE_INVALID_RE = re.compile(r'[^a-z0-9\._]+')
+
+def _normalize_uncached(text: str) -> str:
+    text = text.lower()
+    if not text.isascii(): # Vía rápida: un nombre ASCII no tiene nada que descomponer
+        if _LATIN_ONLY_RE.fullmatch(text):
+            text = text.translate(_LATIN_TABLE)
+        else:
+            text = _strip_accents_nfd(text)
+    return _NORMALIZE_INVALID_RE.sub('_', text).strip('_')
+
+_normalize_cached = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(_normalize_uncached)
 
 def handle_duplicates(destination_path: Path) -> Path:
-    if not destination_path.exists():
+    # Un solo stat responde "¿existe?" y "¿es archivo?" a la vez
+    try:
+        is_file = stat.S_ISREG(os.stat(destination_path).st_mode)
+    except (FileNotFoundError, NotADirectoryError):
         return destination_path
     parent = destination_path.parent
-    base_name = destination_path.stem if destination_path.is_file() else destination_path.name
-    extension = destination_path.suffix if destination_path.is_file() else ""
+    base_name = destination_path.stem if is_file else destination_path.name
+    extension = destination_path.suffix if is_file else ""
+    clean_base_name = DUPLICATE_SUFFIX_RE.sub('', base_name)
     counter = 1
     while True:
-        clean_base_name = re.sub(r' \(\d+\)$', '', base_name)
         new_name = f"{clean_base_name} ({counter}){extension}"
         new_path = parent / new_name
         if not new_path.exists():
             return new_path
         counter += 1
 
+class DestinationIndex:
+    """
+    Índice en memoria de los nombres de UNA carpeta destino, armado con un
+    solo listado. Reemplaza los exists() de handle_duplicates dentro de una
+    corrida: el siguiente "(n)" libre sale directo del índice.
+    Da los mismos nombres que handle_duplicates (el primer "(n)" libre).
+
+    claim() resuelve y reserva el nombre bajo un candado: las corridas que
+    comparten el índice (ver DestinationIndexRegistry) nunca eligen el mismo.
+    """
+
+    def __init__(self, folder: Path):
+        self._entries = {}     # nombre (normcase) -> True si es archivo
+        self._next_suffix = {} # (base limpia, extensión) -> primer (n) que podría estar libre
+        self._lock = threading.Lock()
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    self._entries[os.path.normcase(entry.name)] = entry.is_file()
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+
+    def resolve(self, name: str) -> str:
+        """Devuelve el nombre final (original o con "(n)") sin tocar el disco."""
+        is_file = self._entries.get(os.path.normcase(name))
+        if is_file is None:
+            return name
+        name_path = Path(name)
+        base_name = name_path.stem if is_file else name
+        extension = name_path.suffix if is_file else ""
+        clean_base_name = DUPLICATE_SUFFIX_RE.sub('', base_name)
+        key = (os.path.normcase(clean_base_name), os.path.normcase(extension))
+        counter = self._next_suffix.get(key, 1)
+        while True:
+            new_name = f"{clean_base_name} ({counter}){extension}"
+            if os.path.normcase(new_name) not in self._entries:
+                # Los nombres anteriores ya están ocupados y el índice solo crece
+                self._next_suffix[key] = counter
+                return new_name
+            counter += 1
+
+    def add(self, name: str, is_file: bool):
+        """Registra un nombre recién ocupado por el ciclo de movimientos."""
+        with self._lock:
+            self._entries[os.path.normcase(name)] = is_file
+
+    def claim(self, name: str, is_file: bool) -> str:
+        """resolve() + add() en un solo paso: el nombre devuelto queda reservado."""
+        with self._lock:
+            final_name = self.resolve(name)
+            self._entries[os.path.normcase(final_name)] = is_file
+            return final_name
+
+    def release(self, name: str):
+        """Libera un nombre reservado con claim() que al final no se ocupó."""
+        with self._lock:
+            is_file = self._entries.pop(os.path.normcase(name), None)
+            if is_file is None:
+                return
+            name_path = Path(name)
+            base_name = name_path.stem if is_file else name
+            extension = name_path.suffix if is_file else ""
+            clean_base_name = DUPLICATE_SUFFIX_RE.sub('', base_name)
+            # El "(n)" liberado puede quedar antes del siguiente libre: volver a buscar desde (1)
+            self._next_suffix.pop((os.path.normcase(clean_base_name), os.path.normcase(extension)), None)
+
+class DestinationIndexRegistry:
+    """
+    Un DestinationIndex por carpeta destino para todo el proceso. Las corridas
+    que escriben a la vez en la misma carpeta (vigilancia y corrida manual,
+    grupos de /api/run-profiles) reservan sus nombres en el mismo índice, así
+    que os.rename / shutil.move nunca caen sobre un archivo de la otra.
+
+    El índice vive mientras alguna corrida lo tenga tomado (acquire/release);
+    la siguiente corrida vuelve a listar la carpeta y ve los cambios de afuera.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {} # carpeta (normcase) -> [DestinationIndex, corridas que lo usan]
+
+    def acquire(self, folder: Path) -> DestinationIndex:
+        key = os.path.normcase(os.path.abspath(folder))
+        with self._lock:
+            slot = self._indexes.get(key)
+            if slot is not None:
+                slot[1] += 1
+                return slot[0]
+        index = DestinationIndex(folder) # El listado va fuera del candado
+        with self._lock:
+            slot = self._indexes.get(key)
+            if slot is None: # Nadie lo armó mientras tanto
+                slot = self._indexes[key] = [index, 0]
+            slot[1] += 1
+            return slot[0]
+
+    def release(self, folder: Path):
+        key = os.path.normcase(os.path.abspath(folder))
+        with self._lock:
+            slot = self._indexes.get(key)
+            if slot is not None:
+                slot[1] -= 1
+                if slot[1] <= 0:
+                    del self._indexes[key]
+
+DESTINATION_INDEXES = DestinationIndexRegistry()
+
+class DuplicateFinder:
+    """
+    Detecta si un archivo ya existe, byte por byte, en UNA carpeta destino.
+    Compara en tres pasos, cada uno más caro que el anterior:
+    tamaño -> hash de los primeros DEDUPE_PARTIAL_BYTES -> hash completo.
+    Los hashes de los archivos de la carpeta se calculan una sola vez por corrida.
+    """
+
+    def __init__(self, folder: Path):
+        self.folder = folder
+        self._by_size = {} # tamaño -> [nombres]
+        self._partial = {} # nombre -> hash parcial
+        self._full = {}    # nombre -> hash completo
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        self._by_size.setdefault(entry.stat().st_size, []).append(entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+
+    def find(self, source_path: str, size: int):
+        """
+        Devuelve (nombre del gemelo o None, (hash parcial, hash completo)) del archivo.
+        Los hashes que no hizo falta calcular quedan en None.
+        """
+        candidates = self._by_size.get(size)
+        if not candidates:
+            return None, (None, None)
+        partial = _file_digest(source_path, DEDUPE_PARTIAL_BYTES)
+        full = None
+        for name in candidates:
+            if self._digest(name, self._partial, DEDUPE_PARTIAL_BYTES) != partial:
+                continue
+            if size <= DEDUPE_PARTIAL_BYTES: # El hash parcial ya cubrió todo el archivo
+                return name, (partial, partial)
+            if full is None:
+                full = _file_digest(source_path)
+            if self._digest(name, self._full) == full:
+                return name, (partial, full)
+        return None, (partial, full)
+
+    def remember(self, name: str, size: int, digests=(None, None)):
+        """Registra un archivo recién llegado a la carpeta (con los hashes ya calculados)."""
+        self._by_size.setdefault(size, []).append(name)
+        if digests[0] is not None:
+            self._partial[name] = digests[0]
+        if digests[1] is not None:
+            self._full[name] = digests[1]
+
+    def _digest(self, name: str, cache: dict, limit: int = None):
+        digest = cache.get(name)
+        if digest is None:
+            try:
+                digest = cache[name] = _file_digest(os.path.join(self.folder, name), limit)
+            except OSError: # Borrado o bloqueado mientras tanto: no cuenta como gemelo
+                return None
+        return digest
+
+def _file_digest(path: str, limit: int = None) -> str:
+    """sha1 de los primeros 'limit' bytes (o de todo el archivo), leyendo por bloques."""
+    digest = hashlib.sha1()
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(DEDUPE_CHUNK_SIZE if remaining is None else min(DEDUPE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
 def sanitize_folder_name(name: str) -> str:
     name = name.strip()
     if not name:
@@ -122,11 +558,87 @@ def is_valid_name(name: str) -> bool:
         return False
     return any(c.isalpha() for c in name)
 
+class SubjectMatcher:
+    """
+    Autómata Aho-Corasick construido una sola vez por ejecución.
+    Encuentra qué materia aparece dentro de un nombre normalizado recorriendo
+    el nombre una sola vez, sin importar cuántas materias tenga el perfil.
+    Si varias coinciden, gana la primera en el orden del perfil (igual que antes).
+    """
+
+    def __init__(self, subjects: list[str], dest_dir: Path):
+        self.subjects = list(subjects)
+        # Mapa materia -> carpeta destino (precalculado, sin sanitizar por archivo)
+        self.folders = [dest_dir / sanitize_folder_name(s) for s in self.subjects]
+
+        goto = [{}]   # transiciones de cada nodo
+        best = [None] # índice de la primera materia (en orden de perfil) que termina aquí
+        for index, subject in enumerate(self.subjects):
+            node = 0
+            for char in subject:
+                next_node = goto[node].get(char)
+                if next_node is None:
+                    next_node = len(goto)
+                    goto[node][char] = next_node
+                    goto.append({})
+                    best.append(None)
+                node = next_node
+            if best[node] is None:
+                best[node] = index
+
+        # Enlaces de fallo (BFS). Cada nodo hereda la mejor materia de su sufijo.
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            inherited = best[fail[node]]
+            if inherited is not None and (best[node] is None or inherited < best[node]):
+                best[node] = inherited
+            for char, child in goto[node].items():
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0) if node else 0
+                queue.append(child)
+
+        self._goto = goto
+        self._fail = fail
+        self._best = best
+
+    @classmethod
+    def combine(cls, matchers: list) -> "SubjectMatcher":
+        """
+        Un solo autómata con las materias de varios perfiles, en orden de prioridad.
+        Como gana el índice más bajo, un nombre va al PRIMER perfil que coincide.
+        """
+        combined = cls([subject for matcher in matchers for subject in matcher.subjects], Path())
+        combined.folders = [folder for matcher in matchers for folder in matcher.folders]
+        return combined
+
+    def match(self, name_normalized: str):
+        """Devuelve el índice de la materia ganadora, o None si ninguna coincide."""
+        goto, fail, best = self._goto, self._fail, self._best
+        found = best[0]
+        if found == 0:
+            return 0
+        node = 0
+        for char in name_normalized:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            candidate = best[node]
+            if candidate is not None and (found is None or candidate < found):
+                found = candidate
+                if found == 0:
+                    break
+        return found
+
 # --- Funciones de Gestión de Perfiles (Modificadas para Flask) ---
 # Ya no imprimen tanto, solo devuelven los datos.
 
 def load_profiles() -> dict:
     """Carga perfiles desde AppData. Devuelve un diccionario de perfiles."""
+    import csv
     try:
         os.makedirs(APP_DATA_DIR, exist_ok=True)
     except Exception as e:
@@ -161,20 +673,129 @@ def load_profiles() -> dict:
         return {}
 
 def save_profiles(profiles_data: dict):
-    """Guarda el diccionario de perfiles en AppData."""
+    """
+    Guarda el diccionario de perfiles en AppData.
+    Escribe a un archivo temporal y lo renombra encima: nunca queda un CSV a medias.
+    """
+    import csv
+    tmp_path = None
     try:
         os.makedirs(APP_DATA_DIR, exist_ok=True)
-        with open(PERFILES_CSV, mode='w', encoding='utf-8', newline='') as f:
+        fd, tmp_path = tempfile.mkstemp(dir=APP_DATA_DIR, prefix=".perfiles_", suffix=".tmp")
+        with open(fd, mode='w', encoding='utf-8', newline='') as f:
             writer = csv.DictWriter(f, fieldnames=PROFILE_FIELDNAMES)
             writer.writeheader()
             for profile in profiles_data.values():
                 writer.writerow(profile)
+        replace_file(tmp_path, PERFILES_CSV)
         print_success("Perfiles guardados.")
         return True
     except Exception as e:
         print_error(f"No se pudo guardar el archivo '{PERFILES_CSV}': {e}")
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
         return False
 
+class ProfileStore:
+    """
+    Caché de perfiles para todo el proceso (una sola instancia: PROFILE_STORE).
+
+    - Solo vuelve a leer perfiles.csv si cambió su fecha de modificación.
+    - Crear un perfil se guarda de inmediato (escritura atómica).
+    - Los contadores de cada corrida se acumulan en memoria y se guardan
+      en segundo plano unos segundos después (write-behind), o al salir.
+    - Un candado evita que dos peticiones pisen los cambios de la otra.
+    Devuelve copias: quien llama nunca modifica la caché por accidente.
+    """
+
+    def __init__(self, flush_delay: float = PROFILE_FLUSH_DELAY):
+        self.lock = threading.RLock()
+        self._profiles = {}
+        self._mtime = None   # mtime de perfiles.csv la última vez que lo leímos/escribimos
+        self._pending = {}   # id_perfil -> (archivos movidos sin guardar, último uso)
+        self._flush_delay = flush_delay
+        self._flush_timer = None
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(PERFILES_CSV).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        self._profiles = load_profiles() if mtime is not None else {}
+        self._mtime = mtime
+        # Alguien más cambió el archivo: volver a aplicar lo que aún no guardamos
+        for profile_id, (moved, last_used) in self._pending.items():
+            if profile_id in self._profiles:
+                self._apply_run(self._profiles[profile_id], moved, last_used)
+
+    @staticmethod
+    def _apply_run(profile: dict, moved: int, last_used: str):
+        profile['ultimo_uso_timestamp'] = last_used
+        profile['contador_archivos_movidos'] += moved
+
+    def _save(self) -> bool:
+        if not save_profiles(self._profiles):
+            return False
+        try:
+            self._mtime = os.stat(PERFILES_CSV).st_mtime_ns
+        except OSError:
+            self._mtime = None
+        self._pending.clear()
+        return True
+
+    def all(self) -> dict:
+        """Todos los perfiles ({id: perfil}), como copias."""
+        with self.lock:
+            self._refresh()
+            return {pid: dict(p) for pid, p in self._profiles.items()}
+
+    def get(self, profile_id: str):
+        """Un perfil (copia) o None si no existe."""
+        with self.lock:
+            self._refresh()
+            profile = self._profiles.get(profile_id)
+            return dict(profile) if profile is not None else None
+
+    def add(self, profile: dict) -> bool:
+        """Agrega un perfil nuevo y lo guarda de inmediato."""
+        with self.lock:
+            self._refresh()
+            self._profiles[profile['id_perfil']] = dict(profile)
+            return self._save()
+
+    def record_run(self, profile_id: str, moved: int):
+        """Suma una corrida al perfil. Se guarda en segundo plano. Devuelve la copia actualizada."""
+        with self.lock:
+            self._refresh()
+            profile = self._profiles.get(profile_id)
+            if profile is None:
+                return None
+            last_used = datetime.now().isoformat()
+            self._apply_run(profile, moved, last_used)
+            previous, _ = self._pending.get(profile_id, (0, None))
+            self._pending[profile_id] = (previous + moved, last_used)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self._flush_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+            return dict(profile)
+
+    def flush(self):
+        """Guarda ya los contadores pendientes (lo llama el temporizador y atexit)."""
+        with self.lock:
+            self._flush_timer = None
+            if self._pending:
+                self._refresh()
+                self._save()
+
+PROFILE_STORE = ProfileStore()
+atexit.register(PROFILE_STORE.flush)
+
 def generate_profile_id() -> str:
     return f"perfil_{int(time.time())}"
 
@@ -182,87 +803,1364 @@ def generate_profile_id() -> str:
 # Esta es la lógica v5.2, pero 'print' se reemplaza por 'log_messages'
 # para poder enviarlos al HTML en el futuro (por ahora solo devuelve el reporte final).
 
-def organize_by_subject(source_dir: Path, dest_dir: Path, subjects: list[str], manage_others: str):
-    """Analiza, clasifica y mueve los archivos. Devuelve un reporte."""
-    report = {"movidos": 0, "omitidos": 0, "renombrados": 0, "logs": []}
+def iter_source_items(source_dir: Path):
+    """
+    Recorre la carpeta de origen en streaming con os.scandir.
+    No arma la lista completa en memoria: el primer archivo se puede mover
+    antes de terminar de leer la carpeta, y cada DirEntry trae su tipo en caché.
+    """
+    with os.scandir(source_dir) as entries:
+        yield from entries
+
+class RunMetrics:
+    """
+    Tiempos por etapa de UNA corrida, en nanosegundos acumulados, más bytes y
+    archivos movidos. Son contadores simples (sin candado): cada hilo usa su
+    propia instancia y al final se juntan con merge().
+    """
+
+    STAGES = ("escanear", "normalizar", "clasificar", "resolver_nombres", "crear_carpetas", "mover")
+
+    def __init__(self):
+        self.stage_ns = dict.fromkeys(self.STAGES, 0)
+        self.files_moved = 0
+        self.bytes_moved = 0
+        self.items_seen = 0
+        self.total_ns = 0
+
+    def merge(self, other: "RunMetrics"):
+        for stage, ns in other.stage_ns.items():
+            self.stage_ns[stage] += ns
+        self.files_moved += other.files_moved
+        self.bytes_moved += other.bytes_moved
+        self.items_seen += other.items_seen
+        self.total_ns += other.total_ns
+
+    def timed_iter(self, stage: str, iterable):
+        """Pasa los items de 'iterable' sumando a 'stage' el tiempo que tarda en producir cada uno."""
+        iterator = iter(iterable)
+        stage_ns = self.stage_ns
+        while True:
+            start = time.perf_counter_ns()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                stage_ns[stage] += time.perf_counter_ns() - start
+                return
+            stage_ns[stage] += time.perf_counter_ns() - start
+            yield item
+
+    def to_json(self) -> dict:
+        total_s = self.total_ns / 1e9
+        return {
+            "segundos": {stage: round(ns / 1e9, 6) for stage, ns in self.stage_ns.items()},
+            "total_s": round(total_s, 6),
+            "items_escaneados": self.items_seen,
+            "archivos_movidos": self.files_moved,
+            "bytes_movidos": self.bytes_moved,
+            "archivos_por_segundo": round(self.files_moved / total_s, 1) if total_s > 0 else 0.0,
+        }
+
+class MoveExecutor:
+    """
+    Ejecuta los movimientos de una corrida, en serie o con un pool de hilos.
+
+    Cada carpeta destino tiene su propio "carril": los archivos que van a la
+    misma carpeta se mueven uno tras otro y en el orden del escaneo, así que
+    la resolución de nombres duplicados es idéntica a la ejecución en serie.
+    Carpetas distintas avanzan en paralelo. Los resultados se publican en el
+    reporte en orden de secuencia, por eso el reporte final es el mismo
+    con 1 hilo o con varios.
+
+    Cada carril mide sus propios tiempos (RunMetrics) y close() los junta en
+    self.metrics, así que medir no agrega candados al ciclo de movimientos.
+
+    Con duplicates='descartar' o 'enlazar', un archivo con nombre repetido que
+    es idéntico a uno del destino (DuplicateFinder) no se copia como "(n)":
+    se borra del origen, o se deja como enlace duro al que ya existe.
+
+    Con un 'journal' (MoveJournal) cada movimiento queda anotado antes y
+    después de tocar el disco.
+    """
+
+    def __init__(self, report: dict, source_dir: Path, workers: int = 1, profile_id: str = "",
+                 duplicates: str = "renombrar", journal: "MoveJournal" = None):
+        self.report = report
+        self.profile_id = profile_id
+        self.duplicates = duplicates
+        self.journal = journal
+        self.workers = max(1, min(int(workers or 1), MAX_MOVE_WORKERS))
+        self._source_dev = _device_of(source_dir)
+        self._folder_devs = {}
+        self._indexes = {} # carpeta destino -> DestinationIndex (de DESTINATION_INDEXES)
+        self._finders = {} # carpeta destino -> DuplicateFinder (solo si hace falta)
+        self.metrics = RunMetrics()
+        self._results = {}
+        self._next_seq = 0
+        self._emit_seq = 0
+        self._pool = None
+        self._lanes = {}
+        self._cond = threading.Condition()
+        if self.workers > 1:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mover")
+        self._max_pending = self.workers * 64
+
+    def skip(self, item_name: str, reason: str):
+        """Registra un item omitido respetando el orden de la corrida."""
+        self._publish(self._take_seq(), ((RunLog.OMITIDO, reason, item_name), "omitidos"))
+
+    def move(self, item_name: str, source_path: str, destination_folder: Path, is_file: bool,
+             size: int = 0):
+        """Encola (o ejecuta directamente, en modo serie) el movimiento de un item."""
+        seq = self._take_seq()
+        task = (seq, item_name, source_path, destination_folder, is_file, size)
+        if self.journal is not None and not self.journal.preplanned:
+            self.journal.planned(source_path, destination_folder, is_file, size)
+        if self._pool is None:
+            self._publish(seq, self._run_task(task, self.metrics))
+            return
+        with self._cond:
+            lane = self._lanes.get(destination_folder)
+            if lane is None:
+                lane = self._lanes[destination_folder] = [deque(), False, RunMetrics()]
+            lane[0].append(task)
+            if not lane[1]:
+                lane[1] = True
+                self._pool.submit(self._drain_lane, lane)
+            # Limitar cuántos resultados quedan pendientes en memoria
+            while self._next_seq - self._emit_seq > self._max_pending:
+                self._cond.wait()
+
+    def wait(self):
+        """Espera a que terminen los movimientos encolados (el executor se puede seguir usando)."""
+        with self._cond:
+            while self._emit_seq < self._next_seq:
+                self._cond.wait()
+
+    def close(self):
+        """Espera a que terminen todos los movimientos, publica los resultados y suelta los índices."""
+        if self._pool is not None:
+            self.wait()
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            for lane in self._lanes.values():
+                self.metrics.merge(lane[2])
+            self._lanes = {}
+        for folder in self._indexes:
+            DESTINATION_INDEXES.release(folder)
+        self._indexes = {}
+
+    def _take_seq(self) -> int:
+        with self._cond:
+            seq = self._next_seq
+            self._next_seq += 1
+            return seq
+
+    def _drain_lane(self, lane):
+        while True:
+            with self._cond:
+                if not lane[0]:
+                    lane[1] = False
+                    return
+                task = lane[0].popleft()
+            try:
+                result = self._run_task(task, lane[2])
+            except Exception as e: # Nunca dejar un carril colgado
+                result = ((RunLog.ERROR, "", task[1], str(e)), "omitidos")
+            self._publish(task[0], result)
+
+    def _run_task(self, task, metrics: RunMetrics):
+        result = self._move_task(task, metrics)
+        # Fila de auditoría por archivo: solo se encola, la escribe ADMIN_LOG por lotes
+        log_admin_action("FILE_MOVED", profile_id=self.profile_id,
+                         subject_assigned=task[3].name, file_size_bytes=task[5],
+                         status=AUDIT_STATUS[result[1]])
+        return result
+
+    def _move_task(self, task, metrics: RunMetrics):
+        _, item_name, source_path, destination_folder, is_file, size = task
+        started = time.perf_counter_ns()
+        index = final_destination = None
+        try:
+            # El índice se comparte con otras corridas que escriben en la misma carpeta
+            index = self._indexes.get(destination_folder)
+            if index is None:
+                index = self._indexes[destination_folder] = DESTINATION_INDEXES.acquire(destination_folder)
+            final_destination = destination_folder / index.claim(item_name, is_file)
+            digests = (None, None)
+            if is_file and self.duplicates != "renombrar" and final_destination.name != item_name:
+                result, size, digests = self._dedupe(item_name, source_path, final_destination, index)
+                if result is not None:
+                    metrics.stage_ns["resolver_nombres"] += time.perf_counter_ns() - started
+                    return result
+            resolved = time.perf_counter_ns()
+            metrics.stage_ns["resolver_nombres"] += resolved - started
+            self._journal_intent(source_path, final_destination)
+            self._move_path(source_path, final_destination, destination_folder)
+            self._journal_done(source_path)
+            metrics.stage_ns["mover"] += time.perf_counter_ns() - resolved
+            metrics.files_moved += 1
+            metrics.bytes_moved += size
+            finder = self._finders.get(destination_folder)
+            if finder is not None and is_file:
+                finder.remember(final_destination.name, size, digests)
+            if final_destination.name != item_name:
+                return ((RunLog.RENOMBRADO, "", item_name, final_destination.name), "renombrados")
+            return ((RunLog.MOVIDO, destination_folder.name, item_name), "movidos")
+        except (IOError, OSError, shutil.Error) as move_error:
+            if final_destination is not None and not os.path.lexists(final_destination):
+                index.release(final_destination.name)
+            return ((RunLog.ERROR, "", item_name, str(move_error)), "omitidos")
+
+    def _dedupe(self, item_name: str, source_path: str, final_destination: Path, index: DestinationIndex):
+        """
+        Busca un gemelo del archivo en el destino. Devuelve (resultado, tamaño, hashes):
+        resultado es None si no hay gemelo y el archivo se debe mover como siempre.
+        """
+        folder = final_destination.parent
+        finder = self._finders.get(folder)
+        if finder is None:
+            finder = self._finders[folder] = DuplicateFinder(folder)
+        size = os.stat(source_path).st_size
+        twin, digests = finder.find(source_path, size)
+        if twin is None:
+            return None, size, digests
+        if self.duplicates == "enlazar":
+            self._journal_intent(source_path, final_destination)
+            try:
+                os.link(folder / twin, final_destination)
+            except OSError: # El sistema de archivos no admite enlaces duros: se mueve normal
+                return None, size, digests
+            try:
+                os.remove(source_path)
+            except OSError:
+                # Sin borrar el origen el enlace sobra: se quita y el item queda como error
+                try:
+                    os.remove(final_destination)
+                except OSError:
+                    pass
+                raise
+            finder.remember(final_destination.name, size, digests)
+            self._journal_done(source_path)
+            return ((RunLog.ENLAZADO, "", item_name, twin, final_destination.name),
+                    "duplicados"), size, digests
+        # Para deshacer basta copiar de vuelta el gemelo que se conserva
+        self._journal_intent(source_path, folder / twin, copy=True)
+        os.remove(source_path)
+        self._journal_done(source_path)
+        index.release(final_destination.name) # El nombre reservado no se usó
+        return ((RunLog.DESCARTADO, "", item_name, twin), "duplicados"), size, digests
+
+    def _journal_intent(self, source_path: str, target: Path, copy: bool = False):
+        if self.journal is not None:
+            entry = {"t": "intento", "de": source_path, "a": str(target)}
+            if copy:
+                entry["copia"] = True
+            self.journal.record(entry)
+
+    def _journal_done(self, source_path: str):
+        if self.journal is not None:
+            self.journal.record({"t": "hecho", "de": source_path})
+
+    def _move_path(self, source_path: str, final_destination: Path, destination_folder: Path):
+        # Vía rápida: mismo volumen -> un simple rename, sin la lógica extra de shutil.move
+        folder_dev = self._folder_devs.get(destination_folder)
+        if folder_dev is None:
+            folder_dev = self._folder_devs[destination_folder] = _device_of(destination_folder)
+        if folder_dev is not None and folder_dev == self._source_dev:
+            try:
+                os.rename(source_path, final_destination)
+                return
+            except OSError:
+                pass # Otro volumen u otro problema: shutil.move decide (copiar y borrar)
+        shutil.move(source_path, str(final_destination))
+
+    def _publish(self, seq: int, result):
+        with self._cond:
+            self._results[seq] = result
+            # Solo se escribe en el reporte en orden de secuencia
+            while self._emit_seq in self._results:
+                event, counter = self._results.pop(self._emit_seq)
+                self.report["logs"].add(*event)
+                self.report[counter] += 1
+                if counter == "renombrados":
+                    self.report["movidos"] += 1
+                self._emit_seq += 1
+            self._cond.notify_all()
+
+AUDIT_STATUS = {"movidos": "MOVIDO", "renombrados": "RENOMBRADO", "duplicados": "DUPLICADO",
+                "omitidos": "ERROR"}
+
+def _device_of(path: Path):
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return None
+
+def _entry_size(entry) -> int:
+    """Tamaño para el log de admin (en Windows DirEntry ya lo trae del escaneo)."""
+    try:
+        return entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        return 0
+
+# --- Log compacto de una corrida ---
+# Con 100k items, una lista de textos y un JSON con todos ellos pesan decenas
+# de MB. RunLog guarda eventos empaquetados y arma el texto solo al leerlo;
+# la API manda contadores y una cola corta, y el resto se pide por páginas a
+# /api/run-log/<id>.
+
+class RunLog:
+    """
+    Log de una corrida como eventos compactos: (código, etiqueta, textos).
+
+    - Los eventos se empaquetan en un bytearray preasignado de
+      RUN_LOG_BUFFER_BYTES; cuando se llena pasa a un archivo temporal, así
+      la memoria no crece con el tamaño de la carpeta. Una corrida pequeña
+      nunca toca el disco.
+    - Las etiquetas que se repiten (carpeta destino, motivo de omisión) se
+      guardan una sola vez y el evento solo lleva su número.
+    - Un índice disperso (un offset cada RUN_LOG_INDEX_EVERY eventos) permite
+      leer cualquier página sin recorrer todo el log.
+    - append(texto) funciona igual que en la lista de antes.
+    Es seguro usarlo desde varios hilos.
+    """
+
+    TEXTO, MOVIDO, RENOMBRADO, OMITIDO, ERROR, ENLAZADO, DESCARTADO = range(7)
+    _FORMATS = (
+        "{0}",
+        "Movido: '{0}' -> (en {label})",
+        "Renombrado: '{0}' -> '{1}'",
+        "Omitiendo ({label}): {0}",
+        "ERROR al mover '{0}': {1}",
+        "Duplicado: '{0}' -> enlace a '{1}' como '{2}'",
+        "Duplicado: '{0}' es idéntico a '{1}' (descartado)",
+    )
+    _HEADER = struct.Struct('<BII') # código, etiqueta, bytes de texto
+    _SEPARATOR = '\x00' # Entre los textos de un evento (no puede ir en un nombre de archivo)
+
+    def __init__(self, buffer_bytes: int = RUN_LOG_BUFFER_BYTES, tail_size: int = RUN_LOG_TAIL):
+        self.id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._buffer = bytearray(buffer_bytes)
+        self._used = 0       # Bytes ocupados del buffer
+        self._flushed = 0    # Bytes que ya están en el archivo (el buffer va después)
+        self._file = None    # Archivo temporal, solo si el buffer se llenó alguna vez
+        self._count = 0
+        self._index = array('Q') # Offset del evento 0, RUN_LOG_INDEX_EVERY, 2*RUN_LOG_INDEX_EVERY...
+        self._labels = [""]
+        self._label_ids = {"": 0}
+        self._tail = deque(maxlen=tail_size) # (código, etiqueta, textos) de los últimos eventos
+
+    def append(self, message: str):
+        """Una línea de texto libre."""
+        self.add(self.TEXTO, "", message)
+
+    def add(self, code: int, label: str, *texts: str):
+        """Un evento: 'label' es la parte repetida (carpeta, motivo), 'texts' lo propio del item."""
+        data = self._SEPARATOR.join(texts).encode('utf-8', 'surrogateescape')
+        with self._lock:
+            label_id = self._label_ids.get(label)
+            if label_id is None:
+                label_id = self._label_ids[label] = len(self._labels)
+                self._labels.append(label)
+            if self._count % RUN_LOG_INDEX_EVERY == 0:
+                self._index.append(self._flushed + self._used)
+            self._write(self._HEADER.pack(code, label_id, len(data)) + data)
+            self._count += 1
+            self._tail.append((code, label_id, texts))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        """Todas las líneas (por páginas, sin cargar el log entero)."""
+        offset = 0
+        while True:
+            lines = self.page(offset, RUN_LOG_PAGE_LIMIT)
+            if not lines:
+                return
+            yield from lines
+            offset += len(lines)
+
+    def tail(self, limit: int = None) -> list:
+        """Las últimas líneas (como mucho 'tail_size')."""
+        with self._lock:
+            events = list(self._tail)
+        if limit is not None:
+            events = events[-limit:] if limit > 0 else []
+        return [self._render(*event) for event in events]
+
+    def page(self, offset: int, limit: int = RUN_LOG_PAGE_LIMIT) -> list:
+        """Hasta 'limit' líneas a partir de la línea 'offset'."""
+        with self._lock:
+            offset = max(0, offset)
+            end = min(self._count, offset + max(0, limit))
+            if offset >= end:
+                return []
+            position = self._index[offset // RUN_LOG_INDEX_EVERY]
+            next_block = -(-end // RUN_LOG_INDEX_EVERY) # Primer bloque del índice que empieza en 'end' o después
+            stop = self._index[next_block] if next_block < len(self._index) else self._flushed + self._used
+            data = self._read(position, stop - position)
+            labels = self._labels
+        lines = []
+        view = memoryview(data)
+        cursor = 0
+        skip = offset % RUN_LOG_INDEX_EVERY
+        while len(lines) < end - offset:
+            code, label_id, size = self._HEADER.unpack_from(view, cursor)
+            cursor += self._HEADER.size
+            if skip:
+                skip -= 1
+            else:
+                texts = bytes(view[cursor:cursor + size]).decode('utf-8', 'surrogateescape')
+                lines.append(self._render(code, label_id, texts.split(self._SEPARATOR), labels))
+            cursor += size
+        return lines
+
+    def _render(self, code: int, label_id: int, texts, labels: list = None) -> str:
+        label = (labels or self._labels)[label_id]
+        return self._FORMATS[code].format(*texts, label=label)
+
+    def _write(self, record: bytes):
+        if self._used + len(record) > len(self._buffer):
+            self._spill()
+            if len(record) > len(self._buffer): # Un texto enorme: directo al archivo
+                self._file.seek(self._flushed)
+                self._file.write(record)
+                self._flushed += len(record)
+                return
+        self._buffer[self._used:self._used + len(record)] = record
+        self._used += len(record)
+
+    def _spill(self):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix="organizador_log_")
+        self._file.seek(self._flushed)
+        self._file.write(memoryview(self._buffer)[:self._used])
+        self._flushed += self._used
+        self._used = 0
+
+    def _read(self, position: int, size: int) -> bytes:
+        """Bytes del log desde 'position': del archivo y/o del buffer."""
+        pieces = []
+        if position < self._flushed:
+            from_file = min(size, self._flushed - position)
+            self._file.flush()
+            self._file.seek(position)
+            pieces.append(self._file.read(from_file))
+            position += from_file
+            size -= from_file
+        if size > 0:
+            start = position - self._flushed
+            pieces.append(bytes(self._buffer[start:start + size]))
+        return b"".join(pieces)
+
+def new_report() -> dict:
+    """Reporte vacío de una corrida. Los contadores se actualizan en vivo."""
+    return {"movidos": 0, "omitidos": 0, "renombrados": 0, "duplicados": 0, "escaneados": 0,
+            "sin_cambios": 0, "cancelado": False, "logs": RunLog()}
+
+RUN_LOGS = {} # id -> RunLog que se puede leer por /api/run-log/<id> (los más recientes)
+RUN_LOGS_LOCK = threading.Lock()
+
+def register_run_log(logs: RunLog):
+    with RUN_LOGS_LOCK:
+        RUN_LOGS[logs.id] = logs
+        while len(RUN_LOGS) > RUN_LOG_HISTORY_LIMIT: # El archivo temporal se borra al soltarlo
+            del RUN_LOGS[next(iter(RUN_LOGS))]
+
+def report_json(report: dict) -> dict:
+    """
+    El reporte listo para jsonify: contadores, las últimas RUN_LOG_TAIL líneas
+    del log y 'log_id' para pedir el log completo a /api/run-log/<id>.
+    """
+    logs = report["logs"]
+    register_run_log(logs)
+    return {**report, "logs": logs.tail(), "log_id": logs.id, "logs_total": len(logs)}
+
+# --- Bitácora de movimientos (journal) ---
+# Cada corrida de un perfil deja un JSONL de solo-agregar en
+# AppData/journal/<id_perfil>/<id_corrida>.jsonl. Antes de mover un item se
+# escribe la intención (de -> a) y después la confirmación, así que si el
+# proceso muere a media corrida se sabe qué se movió y a dónde. Con eso la
+# siguiente corrida termina lo pendiente y /api/undo-run deshace una corrida.
+#
+# Registros ("t"):
+#   inicio    datos de la corrida
+#   plan      item que se va a mover (de, carpeta, archivo, tam)
+#   intento   nombre final elegido (a); 'copia' si 'a' es un gemelo que se conserva
+#   hecho     el movimiento terminó
+#   deshecho  el movimiento se revirtió (/api/undo-run)
+#   fin       la corrida terminó (o se reanudó en otra: 'reanudada_en')
+
+class MoveJournal:
+    """
+    Escritor de la bitácora de UNA corrida. Cada registro se escribe y se
+    pasa al sistema operativo enseguida (sobrevive a que se cierre la app);
+    el fsync a disco va por lotes (JOURNAL_SYNC_EVERY registros o
+    JOURNAL_SYNC_INTERVAL segundos) para no frenar los movimientos.
+    Es seguro usarlo desde los hilos de MoveExecutor.
+
+    Una corrida nueva que termina sin ningún "hecho" no deja bitácora (close
+    la borra y marca 'discarded'): no hay nada que deshacer, y las corridas
+    vacías de la vigilancia no deben desplazar a las de verdad del límite
+    JOURNAL_HISTORY_LIMIT.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.run_id = path.stem
+        self.preplanned = False # True si el plan completo ya se escribió (write_plan)
+        self.new_run = False    # True si la creó start() (no es una bitácora vieja reabierta)
+        self.done = 0           # Registros "hecho" escritos por esta instancia
+        self.discarded = False
+        self._file = open(path, mode='a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    @classmethod
+    def start(cls, profile_id: str, source_dir: Path, dest_dir: Path):
+        """Crea la bitácora de una corrida nueva. Devuelve None si no se puede escribir."""
+        folder = JOURNAL_DIR / profile_id
+        run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{uuid.uuid4().hex[:4]}"
+        try:
+            os.makedirs(folder, exist_ok=True)
+            prune_journals(folder)
+            journal = cls(folder / f"{run_id}.jsonl")
+        except OSError as e:
+            print_warning(f"No se pudo crear la bitácora de movimientos: {e}")
+            return None
+        journal.new_run = True
+        journal.record({"t": "inicio", "corrida": run_id, "perfil": profile_id,
+                        "origen": str(source_dir), "destino": str(dest_dir),
+                        "fecha": datetime.now().isoformat(timespec='seconds')}, sync=True)
+        return journal
+
+    def record(self, entry: dict, sync: bool = False):
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                self._file.write(line)
+                self._file.flush()
+                if entry.get("t") == "hecho":
+                    self.done += 1
+                self._unsynced += 1
+                now = time.monotonic()
+                if (sync or self._unsynced >= JOURNAL_SYNC_EVERY
+                        or now - self._last_sync >= JOURNAL_SYNC_INTERVAL):
+                    os.fsync(self._file.fileno())
+                    self._unsynced = 0
+                    self._last_sync = now
+            except OSError as e: # Disco lleno, etc.: la corrida sigue, sin bitácora
+                print_warning(f"Se dejó de escribir la bitácora {self.path.name}: {e}")
+                self._close_file()
+
+    def planned(self, source_path: str, destination_folder: Path, is_file: bool, size: int = 0):
+        self.record({"t": "plan", "de": source_path, "carpeta": str(destination_folder),
+                     "archivo": is_file, "tam": size})
+
+    def write_plan(self, entries):
+        """Escribe de una vez todos los movimientos de un plan (vista previa aplicada)."""
+        for entry in entries:
+            if entry.skip_reason is None:
+                self.planned(entry.source, entry.destination, entry.is_file, entry.size)
+        self.record({"t": "plan_completo"}, sync=True)
+        self.preplanned = True
+
+    def close(self, complete: bool = True, **extra):
+        """Cierra la bitácora. Solo con complete=True se marca la corrida como terminada."""
+        if complete:
+            self.record({"t": "fin", **extra}, sync=True)
+        with self._lock:
+            self._close_file()
+        if complete and self.new_run and not self.done:
+            # El "fin" ya está escrito: si no se puede borrar, queda como corrida vacía terminada
+            try:
+                os.remove(self.path)
+                self.discarded = True
+            except OSError:
+                pass
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError:
+            pass
+        self._file.close()
+        self._file = None
+
+def read_journal(path: Path) -> tuple[dict, dict]:
+    """
+    Lee una bitácora. Devuelve (encabezado, movimientos) donde movimientos es
+    {origen: {"carpeta", "archivo", "tam", "a", "copia", "hecho", "deshecho", "orden"}}
+    y 'orden' es la posición del "hecho" (para deshacer en orden inverso).
+    Una última línea a medio escribir (la app se cerró en ese momento) se ignora.
+    """
+    header = {}
+    moves = {}
+    done_order = 0
+    with open(path, mode='r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            kind = entry.get("t")
+            if kind in ("inicio", "fin", "plan_completo", "deshecho_fin"):
+                header[kind] = entry
+                continue
+            move = moves.setdefault(entry.get("de"), {"hecho": False, "deshecho": False})
+            if kind == "plan":
+                move.update(carpeta=entry["carpeta"], archivo=entry["archivo"], tam=entry.get("tam", 0))
+            elif kind == "intento":
+                move.update(a=entry["a"], copia=entry.get("copia", False))
+            elif kind == "hecho":
+                done_order += 1
+                move.update(hecho=True, deshecho=False, orden=done_order)
+            elif kind == "deshecho":
+                move["deshecho"] = True
+    return header, moves
+
+def profile_journals(profile_id: str) -> list:
+    """Bitácoras de un perfil, de la más vieja a la más nueva (el nombre empieza con la fecha)."""
+    try:
+        return sorted((JOURNAL_DIR / profile_id).glob("*.jsonl"))
+    except OSError:
+        return []
+
+def prune_journals(folder: Path):
+    """Borra las bitácoras más viejas de un perfil, dejando JOURNAL_HISTORY_LIMIT."""
+    journals = sorted(folder.glob("*.jsonl"))
+    for path in journals[:max(0, len(journals) - JOURNAL_HISTORY_LIMIT)]:
+        header, _ = read_journal(path)
+        if "fin" in header: # Una corrida interrumpida se guarda hasta que se reanude
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _is_partial_copy(target: str, source_path: str, is_file: bool, run_started: float) -> bool:
+    """
+    ¿'target' es lo que dejó una copia entre discos interrumpida? Tiene que
+    ser del mismo tipo que el origen, no más grande, y haberse escrito durante
+    la corrida (o tener la fecha del origen, que copy2 copia al terminar).
+    """
+    if run_started is None:
+        return False
+    try:
+        target_st = os.lstat(target)
+        source_st = os.lstat(source_path)
+    except OSError:
+        return False
+    if stat.S_ISREG(target_st.st_mode) != is_file or stat.S_ISDIR(target_st.st_mode) == is_file:
+        return False
+    if is_file and target_st.st_size > source_st.st_size:
+        return False
+    return (target_st.st_mtime_ns == source_st.st_mtime_ns or
+            target_st.st_mtime >= int(run_started))
+
+def _remove_leftover(path: str):
+    """Borra la copia a medias de un movimiento entre discos que se interrumpió."""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+def resume_interrupted_runs(profile_id: str, executor: MoveExecutor, report: dict) -> int:
+    """
+    Termina lo que dejaron a medias las corridas interrumpidas del perfil
+    (bitácoras sin "fin"), sin volver a escanear ni clasificar: los items
+    pendientes se mandan directo a 'executor' (que los anota en la bitácora
+    nueva). Devuelve cuántos items se retomaron.
+
+    Un movimiento con intención pero sin confirmar se revisa en el disco:
+    si el origen ya no está y el destino sí, se movió; si están los dos y el
+    destino parece la copia entre discos a medias (_is_partial_copy), se
+    borra antes de reintentar. Si no lo parece (la app se cerró antes de
+    copiar y ese nombre ya es de otro archivo), se deja y el reintento elige
+    otro nombre.
+    """
+    resumed = 0
+    current = executor.journal.path if executor.journal is not None else None
+    for path in profile_journals(profile_id):
+        if path == current:
+            continue
+        try:
+            header, moves = read_journal(path)
+        except OSError:
+            continue
+        if "fin" in header:
+            continue
+        try:
+            run_started = datetime.fromisoformat(header["inicio"]["fecha"]).timestamp()
+        except (KeyError, ValueError):
+            run_started = None
+        pending = []
+        old_journal = MoveJournal(path)
+        for source_path, move in moves.items():
+            if move["hecho"] or "carpeta" not in move:
+                continue
+            source_exists = os.path.lexists(source_path)
+            target = move.get("a")
+            target_exists = target is not None and os.path.lexists(target)
+            if not source_exists:
+                if target_exists: # Se movió pero no alcanzó a confirmarse
+                    old_journal.record({"t": "hecho", "de": source_path})
+                else:
+                    report["logs"].append(f"AVISO: '{source_path}' ya no existe; no se retoma.")
+                continue
+            if target_exists and not move.get("copia"):
+                if not _is_partial_copy(target, source_path, move["archivo"], run_started):
+                    report["logs"].append(f"AVISO: '{target}' no es una copia a medias; se deja y se usa otro nombre.")
+                    pending.append((source_path, move))
+                    continue
+                try:
+                    _remove_leftover(target)
+                except OSError as e:
+                    report["logs"].append(f"ERROR al limpiar la copia a medias '{target}': {e}")
+                    continue
+            pending.append((source_path, move))
+        old_journal.close(reanudada_en=executor.journal.run_id if executor.journal is not None else "")
+        if not pending:
+            continue
+        report["logs"].append(f"Retomando corrida interrumpida {path.stem}: {len(pending)} items pendientes.")
+        for source_path, move in pending:
+            executor.move(os.path.basename(source_path), source_path, Path(move["carpeta"]),
+                          move["archivo"], move.get("tam", 0))
+        resumed += len(pending)
+    # Terminar antes de escanear: si no, el escaneo vería los mismos archivos todavía en el origen
+    executor.wait()
+    return resumed
+
+def undo_run(journal_path: Path, workers: int = 1) -> dict:
+    """
+    Deshace una corrida: cada item movido vuelve a su carpeta de origen, en
+    orden inverso. Los nombres se reservan primero en memoria (el
+    DestinationIndex compartido de cada carpeta de origen, por si ahí apareció
+    otro archivo con el mismo nombre) y luego los movimientos corren en paralelo.
+    Los gemelos descartados ('copia') se restauran copiando el que se conservó.
+    """
+    result = {"restaurados": 0, "renombrados": 0, "omitidos": 0, "logs": RunLog()}
+    header, moves = read_journal(journal_path)
+    done = sorted(((source, move) for source, move in moves.items() if move["hecho"] and not move["deshecho"]),
+                  key=lambda pair: pair[1]["orden"], reverse=True)
+    indexes = {}
+    tasks = []
+    for source_path, move in done:
+        target = move.get("a")
+        if target is None or not os.path.lexists(target):
+            result["omitidos"] += 1
+            result["logs"].append(f"Omitiendo: '{target}' ya no está en el destino.")
+            continue
+        original = Path(source_path)
+        index = indexes.get(original.parent)
+        if index is None:
+            index = indexes[original.parent] = DESTINATION_INDEXES.acquire(original.parent)
+        final_name = index.claim(original.name, move.get("archivo", True))
+        tasks.append((source_path, target, original.parent / final_name, move.get("copia", False)))
+
+    journal = MoveJournal(journal_path)
+
+    def restore(task):
+        source_path, target, final_path, copy = task
+        try:
+            os.makedirs(final_path.parent, exist_ok=True)
+            if copy:
+                shutil.copy2(target, final_path)
+            else:
+                shutil.move(target, str(final_path))
+        except (IOError, OSError, shutil.Error) as e:
+            return task, f"ERROR al restaurar '{target}': {e}"
+        journal.record({"t": "deshecho", "de": source_path})
+        return task, None
+
+    workers = max(1, min(int(workers or 1), MAX_MOVE_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="deshacer") as pool:
+        for (source_path, target, final_path, _), error in pool.map(restore, tasks):
+            if error is not None:
+                if not os.path.lexists(final_path):
+                    indexes[final_path.parent].release(final_path.name)
+                result["omitidos"] += 1
+                result["logs"].append(error)
+            elif final_path.name != os.path.basename(source_path):
+                result["restaurados"] += 1
+                result["renombrados"] += 1
+                result["logs"].append(f"Restaurado como '{final_path.name}': '{target}'")
+            else:
+                result["restaurados"] += 1
+                result["logs"].append(f"Restaurado: '{target}' -> '{source_path}'")
+    for folder in indexes:
+        DESTINATION_INDEXES.release(folder)
+    if not result["omitidos"]:
+        journal.record({"t": "deshecho_fin"}, sync=True)
+    # Una corrida interrumpida que se deshace ya no se debe retomar
+    journal.close(complete="fin" not in header, deshecha=True)
+    result["corrida"] = journal_path.stem
+    result["perfil"] = header.get("inicio", {}).get("perfil", "")
+    return result
+
+# --- Plan de organización (clasificar sin tocar el disco) ---
+# La corrida tiene dos fases: el PLAN (escanear y clasificar, solo memoria)
+# y la APLICACIÓN (crear carpetas y mover). organize_by_subject puede consumir
+# el plan en streaming o aplicar un plan ya calculado (vista previa).
+
+class ScanCheckpoint:
+    """
+    Lo que ya se revisó y se omitió en corridas anteriores de un perfil:
+    {nombre: [tamaño, mtime_ns]} en AppData/checkpoints/<id_perfil>.json.
+
+    Si un archivo que "no coincide" sigue igual (mismo tamaño y fecha), la
+    siguiente corrida lo salta sin normalizar ni clasificar, y sin llenar el
+    log. Si cambian las materias, el destino, el manejo de "Otros" o el modo
+    por contenido, la firma ya no coincide y se empieza de cero (un archivo
+    que no coincidió por nombre todavía no se ha leído por dentro).
+    """
+
+    def __init__(self, profile_id: str, signature: str, known: dict = None):
+        self.path = CHECKPOINTS_DIR / f"{profile_id}.json"
+        self.signature = signature
+        self.known = known or {} # De la corrida anterior
+        self.seen = {}           # De esta corrida
+
+    @classmethod
+    def load(cls, profile_id: str, subjects: list[str], manage_others: str, dest_dir: Path,
+             fresh: bool = False, content: bool = False):
+        """Lee el checkpoint del perfil. Con fresh=True empieza vacío (se revisa todo)."""
+        parts = [MATERIAS_SEPARATOR.join(subjects), manage_others, str(dest_dir)]
+        if content: # Sin contenido la firma queda como antes: no se pierden checkpoints viejos
+            parts.append("contenido")
+        raw = "\n".join(parts)
+        signature = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        checkpoint = cls(profile_id, signature)
+        if fresh:
+            return checkpoint
+        try:
+            with open(checkpoint.path, mode='r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('firma') == signature:
+                checkpoint.known = data.get('items', {})
+        except (OSError, ValueError):
+            pass
+        return checkpoint
+
+    def is_unchanged(self, entry) -> bool:
+        """True si el item ya se omitió antes y no ha cambiado. Solo hace stat si se conoce el nombre."""
+        previous = self.known.get(entry.name)
+        if previous is None:
+            return False
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            return False
+        if [st.st_size, st.st_mtime_ns] != previous:
+            return False
+        self.seen[entry.name] = previous
+        return True
+
+    def remember(self, entry):
+        """Anota un item omitido por "no coincide" para saltarlo la próxima vez."""
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            return
+        self.seen[entry.name] = [st.st_size, st.st_mtime_ns]
+
+    def save(self, complete: bool = True):
+        """
+        Guarda lo visto en esta corrida (escritura atómica). Si la corrida no
+        terminó ('complete' False), conserva también lo anterior no revisado.
+        """
+        items = self.seen if complete else {**self.known, **self.seen}
+        tmp_path = None
+        try:
+            os.makedirs(CHECKPOINTS_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=CHECKPOINTS_DIR, suffix=".tmp")
+            with open(fd, mode='w', encoding='utf-8') as f:
+                json.dump({'firma': self.signature, 'items': items}, f, separators=(',', ':'))
+            replace_file(tmp_path, self.path)
+        except OSError as e:
+            print_warning(f"No se pudo guardar el checkpoint del perfil: {e}")
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+class PlanEntry(NamedTuple):
+    """Decisión para un item de la carpeta de origen."""
+    name: str
+    source: str                 # Ruta completa del item
+    is_file: bool
+    size: int
+    destination: Path = None    # Carpeta destino (None si se omite)
+    subject: str = None         # Materia asignada, o "Otros"
+    final_name: str = None      # Nombre final previsto (solo en planes precalculados)
+    skip_reason: str = None     # "sistema/temporal", "tipo desconocido", "no coincide", "sin cambios"
+
+class OrganizationPlan:
+    """Plan completo y reutilizable de una corrida (ver plan_organization)."""
+
+    def __init__(self, source_dir: Path, dest_dir: Path, subjects: list[str], manage_others: str,
+                 entries: list, profile_id: str = "", checkpoint: ScanCheckpoint = None):
+        self.id = uuid.uuid4().hex
+        self.checkpoint = checkpoint
+        self.profile_id = profile_id
+        self.source_dir = source_dir
+        self.dest_dir = dest_dir
+        self.subjects = subjects
+        self.manage_others = manage_others
+        self.entries = entries
+        self.created = time.time()
+
+    def summary(self) -> dict:
+        to_move = [e for e in self.entries if e.skip_reason is None]
+        return {
+            "items": len(self.entries),
+            "mover": len(to_move),
+            "renombrar": sum(1 for e in to_move if e.final_name != e.name),
+            "omitir": len(self.entries) - len(to_move),
+        }
+
+    def to_json(self) -> dict:
+        return {
+            "plan_id": self.id,
+            "profile_id": self.profile_id,
+            "resumen": self.summary(),
+            "entradas": [{
+                "nombre": e.name,
+                "materia": e.subject,
+                "destino": str(e.destination) if e.destination is not None else None,
+                "nombre_final": e.final_name,
+                "omitido": e.skip_reason,
+            } for e in self.entries],
+        }
+
+def classify_entry(item, matcher: SubjectMatcher, other_dir: Path,
+                   checkpoint: ScanCheckpoint = None, metrics: RunMetrics = None) -> PlanEntry:
+    """
+    Decide qué hacer con un DirEntry del escaneo.
+    'other_dir' es la carpeta "Otros", o None si los que no coinciden se omiten.
+    Con 'checkpoint', lo ya omitido antes y sin cambios no se vuelve a clasificar.
+    Con 'metrics', se mide cuánto toma normalizar y buscar la materia.
+    """
+    if (item.name == "app.py" or # Actualizado de "organizador_archivos.py"
+        item.name == PERFILES_CSV.name or 
+        item.name == ADMIN_LOG_CSV.name or
+        item.is_symlink() or 
+        os.path.splitext(item.name)[1].lower() == '.lnk' or 
+        item.name.startswith("~$")):
+        return PlanEntry(item.name, item.path, False, 0, skip_reason="sistema/temporal")
+    
+    # DirEntry guarda el tipo del escaneo: no hay stat extra por archivo
+    is_file = item.is_file()
+    if not is_file and not item.is_dir():
+        return PlanEntry(item.name, item.path, False, 0, skip_reason="tipo desconocido")
+
+    if checkpoint is not None and checkpoint.is_unchanged(item):
+        return PlanEntry(item.name, item.path, is_file, 0, skip_reason="sin cambios")
+
+    if metrics is None:
+        subject_index = matcher.match(normalize_text(item.name))
+    else:
+        started = time.perf_counter_ns()
+        name_normalized = normalize_text(item.name)
+        normalized = time.perf_counter_ns()
+        subject_index = matcher.match(name_normalized)
+        metrics.stage_ns["normalizar"] += normalized - started
+        metrics.stage_ns["clasificar"] += time.perf_counter_ns() - normalized
+    if subject_index is None and other_dir is None:
+        if checkpoint is not None:
+            checkpoint.remember(item)
+        return PlanEntry(item.name, item.path, is_file, 0, skip_reason="no coincide")
+
+    size = _entry_size(item) if is_file else 0
+    if subject_index is not None:
+        return PlanEntry(item.name, item.path, is_file, size,
+                         matcher.folders[subject_index], matcher.subjects[subject_index])
+    return PlanEntry(item.name, item.path, is_file, size, other_dir, "Otros")
+
+def classify_items(items, matcher: SubjectMatcher, other_dir: Path, checkpoint: ScanCheckpoint = None,
+                   metrics: RunMetrics = None):
+    """Convierte cada DirEntry del escaneo en un PlanEntry (en streaming)."""
+    for item in items:
+        yield classify_entry(item, matcher, other_dir, checkpoint, metrics)
+
+class ScanOptions(NamedTuple):
+    """Cómo recorrer la carpeta de origen."""
+    recursive: bool = False                 # Entrar a las subcarpetas que no coinciden
+    max_depth: int = RECURSIVE_MAX_DEPTH    # Niveles de subcarpetas como máximo
+    exclude: tuple = ()                     # Patrones glob ("*.iso", "node_modules", "Fotos/*")
+    walk_workers: int = RECURSIVE_WALK_WORKERS # Hilos que leen subcarpetas en paralelo
+    content: bool = False                   # Buscar materias dentro del archivo (ContentClassifier)
+
+def _list_dir(path: str) -> list:
+    with os.scandir(path) as entries:
+        return list(entries)
+
+def classify_tree(source_dir: Path, dest_dir: Path, matcher: SubjectMatcher, other_dir: Path,
+                  options: ScanOptions, metrics: RunMetrics = None):
+    """
+    Modo recursivo: clasifica también lo que está DENTRO de las carpetas que
+    no coinciden, archivo por archivo, con las mismas reglas de nombre.
+
+    - Una carpeta que coincide con una materia se mueve completa (como siempre).
+    - Una carpeta que no coincide no se mueve a "Otros": se abre y se
+      clasifica su contenido, hasta 'max_depth' niveles.
+    - Solo lo que no coincide en el primer nivel va a "Otros"; lo que no
+      coincide más adentro se queda donde está.
+    - Las subcarpetas se leen en paralelo ('walk_workers' hilos), pero los
+      resultados salen en orden fijo (por niveles), así que el plan es repetible.
+    """
+    dest_key = os.path.normcase(os.path.abspath(dest_dir))
+    pending = deque() # (futuro con el listado, ruta relativa, profundidad)
+
+    def walk(items, rel_dir: str, depth: int):
+        for item in items:
+            rel_path = f"{rel_dir}/{item.name}" if rel_dir else item.name
+            if options.exclude and any(fnmatch.fnmatch(rel_path, pattern) or fnmatch.fnmatch(item.name, pattern)
+                                       for pattern in options.exclude):
+                yield PlanEntry(rel_path, item.path, False, 0, skip_reason="excluido")
+                continue
+            if os.path.normcase(os.path.abspath(item.path)) == dest_key:
+                # Nunca reorganizar la propia carpeta destino
+                yield PlanEntry(rel_path, item.path, False, 0, skip_reason="carpeta destino")
+                continue
+            entry = classify_entry(item, matcher, other_dir if depth == 0 else None, metrics=metrics)
+            unmatched_dir = ((entry.subject == "Otros" or entry.skip_reason == "no coincide")
+                             and not entry.is_file and item.is_dir())
+            if unmatched_dir and depth < options.max_depth:
+                pending.append((pool.submit(_list_dir, item.path), rel_path, depth + 1))
+                continue
+            if depth and entry.skip_reason is not None:
+                entry = entry._replace(name=rel_path) # En el log se ve dónde estaba
+            yield entry
+
+    with ThreadPoolExecutor(max_workers=max(1, options.walk_workers), thread_name_prefix="recorrer") as pool:
+        top_items = iter_source_items(source_dir)
+        if metrics is not None:
+            top_items = metrics.timed_iter("escanear", top_items)
+        yield from walk(top_items, "", 0)
+        while pending:
+            future, rel_dir, depth = pending.popleft()
+            started = time.perf_counter_ns()
+            try:
+                items = future.result()
+            except OSError:
+                yield PlanEntry(rel_dir, "", False, 0, skip_reason="no se pudo leer")
+                continue
+            finally:
+                if metrics is not None: # Lo que se esperó al listado de la subcarpeta
+                    metrics.stage_ns["escanear"] += time.perf_counter_ns() - started
+            yield from walk(items, rel_dir, depth)
+
+class ContentClassifier:
+    """
+    Etapa opcional: si el NOMBRE de un archivo no coincide con ninguna materia,
+    busca las materias dentro de su contenido (PDF, DOCX, TXT...).
+
+    - Solo se leen los primeros CONTENT_READ_LIMIT bytes (extractor_contenido.py).
+    - El texto se guarda en una caché SQLite por (ruta, tamaño, fecha): un
+      archivo sin cambios nunca se vuelve a leer, ni en corridas futuras.
+      Solo se guarda el de los archivos que se quedan en el origen (los que
+      se mueven no se vuelven a buscar ahí), y una vez por sesión se borran
+      las filas de rutas que ya no existen.
+    - La extracción corre en un pool de PROCESOS (no bloquea el ciclo de
+      movimientos). Mientras tanto, los demás items siguen avanzando; los que
+      esperan texto salen después, en el mismo orden en que llegaron.
+    - Cada texto nuevo se confirma enseguida (modo WAL, commits baratos): una
+      corrida nunca retiene la caché y dos corridas por contenido pueden ir a
+      la vez. Si la caché falla, el archivo simplemente se vuelve a leer.
+    """
+
+    def __init__(self, matcher: SubjectMatcher, workers: int = None, window: int = None):
+        self.matcher = matcher
+        self.workers = workers or CONTENT_WORKERS
+        self.window = window or self.workers * 4 # Archivos esperando texto a la vez
+        import extractor_contenido # Lectura de PDF/DOCX/TXT (solo hace falta en este modo)
+        self._extract_text = extractor_contenido.extract_text
+        self._extensions = extractor_contenido.SUPPORTED_EXTENSIONS
+        self._db = None
+        self._pool = None
+
+    _pruned = False # La limpieza de rutas viejas corre una vez por sesión
+
+    def refine(self, entries):
+        """Generador: deja pasar los PlanEntry, reclasificando por contenido los que no coinciden."""
+        waiting = deque() # (entry, stat, futuro)
+        try:
+            for entry in entries:
+                if not self._is_candidate(entry):
+                    yield entry
+                    continue
+                try:
+                    st = os.stat(entry.source)
+                except OSError:
+                    yield entry
+                    continue
+                text = self._cached_text(entry.source, st)
+                if text is not None:
+                    refined = self._reclassify(entry, st, text)
+                    if refined.skip_reason is None: # Se va a mover: la fila ya no sirve
+                        self._write_cache(("DELETE FROM textos WHERE ruta = ?", (entry.source,)))
+                    yield refined
+                    continue
+                waiting.append((entry, st, self._submit(entry.source)))
+                while len(waiting) > self.window:
+                    yield self._resolve(*waiting.popleft())
+            while waiting:
+                yield self._resolve(*waiting.popleft())
+        finally:
+            for _, _, future in waiting:
+                future.cancel()
+            self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._db is not None:
+            import sqlite3
+            if not ContentClassifier._pruned:
+                ContentClassifier._pruned = True
+                self._prune_missing()
+            try:
+                self._db.close()
+            except sqlite3.Error:
+                pass
+            self._db = None
+
+    def _is_candidate(self, entry: PlanEntry) -> bool:
+        return (entry.is_file and
+                (entry.skip_reason == "no coincide" or entry.subject == "Otros") and
+                os.path.splitext(entry.name)[1].lower() in self._extensions)
+
+    def _connection(self):
+        if self._db is None:
+            import sqlite3
+            os.makedirs(APP_DATA_DIR, exist_ok=True)
+            db = sqlite3.connect(CONTENT_CACHE_DB, timeout=CONTENT_CACHE_TIMEOUT)
+            # WAL: leer no espera a quien escribe, y cada commit es corto (sin fsync)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._db = db
+            self._db.execute("""CREATE TABLE IF NOT EXISTS textos (
+                ruta TEXT NOT NULL, tamano INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+                texto TEXT NOT NULL, PRIMARY KEY (ruta, tamano, mtime_ns))""")
+        return self._db
+
+    def _cached_text(self, path: str, st):
+        import sqlite3
+        try:
+            row = self._connection().execute(
+                "SELECT texto FROM textos WHERE ruta = ? AND tamano = ? AND mtime_ns = ?",
+                (path, st.st_size, st.st_mtime_ns)).fetchone()
+        except sqlite3.Error: # Caché bloqueada o dañada: como si no estuviera
+            return None
+        return row[0] if row else None
+
+    def _submit(self, path: str):
+        if self._pool is None:
+            from concurrent.futures import ProcessPoolExecutor # Importa multiprocessing: solo si hace falta
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool.submit(self._extract_text, path, CONTENT_READ_LIMIT)
+
+    def _resolve(self, entry: PlanEntry, st, future) -> PlanEntry:
+        try:
+            text = future.result()
+        except Exception: # Proceso caído o archivo ilegible: se queda como estaba
+            return entry
+        refined = self._reclassify(entry, st, text)
+        if refined.skip_reason is not None: # Se queda en el origen: la próxima corrida no lo relee
+            self._write_cache(("DELETE FROM textos WHERE ruta = ?", (entry.source,)), # Versiones viejas
+                              ("INSERT OR REPLACE INTO textos VALUES (?, ?, ?, ?)",
+                               (entry.source, st.st_size, st.st_mtime_ns, text)))
+        return refined
+
+    def _prune_missing(self):
+        """Borra las filas de archivos que ya no están en esa ruta (se movieron o se borraron)."""
+        import sqlite3
+        try:
+            paths = [row[0] for row in self._db.execute("SELECT DISTINCT ruta FROM textos")]
+        except sqlite3.Error:
+            return
+        missing = [(path,) for path in paths if not os.path.lexists(path)]
+        if missing:
+            self._write_cache(*(("DELETE FROM textos WHERE ruta = ?", params) for params in missing))
+
+    def _write_cache(self, *statements):
+        """Ejecuta (sql, parámetros) en una sola transacción y la confirma enseguida."""
+        import sqlite3
+        try:
+            db = self._connection()
+            for sql, params in statements:
+                db.execute(sql, params)
+            db.commit()
+        except sqlite3.Error: # Caché ocupada más de CONTENT_CACHE_TIMEOUT o dañada: no se guarda
+            try:
+                self._db.rollback()
+            except (sqlite3.Error, AttributeError):
+                pass
+
+    def _reclassify(self, entry: PlanEntry, st, text: str) -> PlanEntry:
+        subject_index = self.matcher.match(normalize_text(text)) if text else None
+        if subject_index is None:
+            return entry
+        return entry._replace(destination=self.matcher.folders[subject_index],
+                              subject=self.matcher.subjects[subject_index],
+                              size=st.st_size, skip_reason=None)
+
+def scan_entries(source_dir: Path, dest_dir: Path, matcher: SubjectMatcher, other_dir: Path,
+                 checkpoint: ScanCheckpoint = None, options: ScanOptions = None,
+                 metrics: RunMetrics = None):
+    """El escaneo + clasificación que usan tanto la corrida como el plan."""
+    if options is not None and options.recursive:
+        entries = classify_tree(source_dir, dest_dir, matcher, other_dir, options, metrics)
+    else:
+        items = iter_source_items(source_dir)
+        if metrics is not None:
+            items = metrics.timed_iter("escanear", items)
+        entries = classify_items(items, matcher, other_dir, checkpoint, metrics)
+    if options is not None and options.content:
+        entries = ContentClassifier(matcher).refine(entries)
+    return entries
+
+def plan_organization(source_dir: Path, dest_dir: Path, subjects: list[str], manage_others: str,
+                      profile_id: str = "", checkpoint: ScanCheckpoint = None,
+                      scan_options: ScanOptions = None) -> OrganizationPlan:
+    """
+    Fase de plan: un solo escaneo, todo en memoria. No crea carpetas ni mueve nada.
+    Los nombres finales se calculan con un DestinationIndex por carpeta destino,
+    igual que lo hará la aplicación del plan.
+    """
+    matcher = SubjectMatcher(subjects, dest_dir)
+    other_dir = dest_dir / "Otros" if manage_others == 'mover' else None
+    indexes = {}
+    entries = []
+    for entry in scan_entries(source_dir, dest_dir, matcher, other_dir, checkpoint, scan_options):
+        if entry.skip_reason is None:
+            index = indexes.get(entry.destination)
+            if index is None:
+                index = indexes[entry.destination] = DestinationIndex(entry.destination)
+            final_name = index.resolve(entry.name)
+            index.add(final_name, entry.is_file)
+            entry = entry._replace(final_name=final_name)
+        entries.append(entry)
+    return OrganizationPlan(source_dir, dest_dir, subjects, manage_others, entries, profile_id, checkpoint)
+
+def dispatch_entries(entries, executor: MoveExecutor, report: dict,
+                     cancel_event: threading.Event = None) -> int:
+    """Manda cada PlanEntry al executor (omitir o mover). Devuelve cuántos items se vieron."""
+    items_seen = 0
+    for entry in entries:
+        if cancel_event is not None and cancel_event.is_set():
+            report["cancelado"] = True
+            break
+        items_seen += 1
+        report["escaneados"] += 1
+        if entry.skip_reason == "sin cambios":
+            report["sin_cambios"] += 1 # Sin línea de log: ya se informó en corridas anteriores
+            continue
+        if entry.skip_reason is not None:
+            executor.skip(entry.name, entry.skip_reason)
+            continue
+        executor.move(entry.name, entry.source, entry.destination, entry.is_file, entry.size)
+    return items_seen
+
+def organize_by_subject(source_dir: Path, dest_dir: Path, subjects: list[str], manage_others: str,
+                        workers: int = 1, report: dict = None, cancel_event: threading.Event = None,
+                        profile_id: str = "", plan: OrganizationPlan = None,
+                        checkpoint: ScanCheckpoint = None, scan_options: ScanOptions = None,
+                        duplicates: str = "renombrar"):
+    """
+    Analiza, clasifica y mueve los archivos. Devuelve un reporte.
+    Con workers > 1 los movimientos corren en un pool de hilos (ver MoveExecutor).
+    Se puede pasar un 'report' ya creado (new_report) para leer el progreso
+    desde otro hilo, y un 'cancel_event' para detener la corrida a medias.
+    Si se pasa un 'plan' (plan_organization), se aplica tal cual sin reclasificar.
+    Con un 'checkpoint' (ScanCheckpoint.load) solo se clasifica lo nuevo o cambiado.
+    Con scan_options.recursive también se clasifica dentro de subcarpetas (classify_tree).
+    'duplicates' (DUPLICATE_MODES) decide qué pasa con archivos idénticos a uno del destino.
+    Los tiempos por etapa quedan en report["metricas"] y en el historial de /api/metrics.
+    Con 'profile_id' los movimientos quedan en una bitácora (report["corrida"], ver
+    MoveJournal) y antes de escanear se termina lo que dejó una corrida interrumpida.
+    """
+    if report is None:
+        report = new_report()
     log_messages = report["logs"]
+    run_started = time.perf_counter_ns()
+    metrics = RunMetrics()
 
     log_messages.append(f"Iniciando organización...")
     log_messages.append(f"Buscando en: {source_dir}")
 
+    folders_started = time.perf_counter_ns()
     other_dir = None
     if manage_others == 'mover':
         other_dir = dest_dir / "Otros"
         os.makedirs(other_dir, exist_ok=True)
     
-    for subject in subjects:
-        subject_folder_name = sanitize_folder_name(subject)
-        subject_path = dest_dir / subject_folder_name
+    # Se construye una sola vez: autómata de materias + mapa materia -> carpeta
+    matcher = SubjectMatcher(subjects, dest_dir)
+    for subject_path in matcher.folders:
         os.makedirs(subject_path, exist_ok=True)
+    metrics.stage_ns["crear_carpetas"] += time.perf_counter_ns() - folders_started
 
+    journal = MoveJournal.start(profile_id, source_dir, dest_dir) if profile_id else None
+    if journal is not None:
+        report["corrida"] = journal.run_id
+    executor = MoveExecutor(report, source_dir, workers, profile_id, duplicates, journal)
+    resumed = 0
     try:
-        items_to_process = list(source_dir.iterdir())
-        if not items_to_process:
-            log_messages.append("AVISO: La carpeta de origen está vacía.")
-            return report
-            
-        log_messages.append(f"Se encontraron {len(items_to_process)} items para analizar...")
-        
-        for item in items_to_process:
-            if (item.name == "app.py" or # Actualizado de "organizador_archivos.py"
-                item.name == PERFILES_CSV.name or 
-                item.name == ADMIN_LOG_CSV.name or
-                item.is_symlink() or 
-                item.suffix.lower() == '.lnk' or 
-                item.name.startswith("~$")):
-                log_messages.append(f"Omitiendo (sistema/temporal): {item.name}")
-                report["omitidos"] += 1
-                continue
+        if journal is not None:
+            resumed = resume_interrupted_runs(profile_id, executor, report)
+        if plan is not None:
+            entries = plan.entries
+            checkpoint = plan.checkpoint
+            if journal is not None:
+                journal.write_plan(entries)
+        else:
+            entries = scan_entries(source_dir, dest_dir, matcher, other_dir, checkpoint, scan_options, metrics)
+        # Lo retomado también cuenta: una corrida que solo retoma no tiene el origen "vacío"
+        items_seen = dispatch_entries(entries, executor, report, cancel_event) + resumed
             
-            if not item.is_file() and not item.is_dir():
-                log_messages.append(f"Omitiendo (tipo desconocido): {item.name}")
-                report["omitidos"] += 1
-                continue
+    except Exception as e:
+        executor.close()
+        if journal is not None:
+            journal.close(error=str(e))
+            if journal.discarded:
+                del report["corrida"]
+        log_messages.append(f"ERROR CRÍTICO al procesar items: {e}")
+        record_run_metrics(metrics, [executor], report, run_started, profile_id)
+        return report
 
-            item_name_normalized = normalize_text(item.name)
-            destination_folder = None
-            found_match = False
-
-            for subject in subjects:
-                if subject in item_name_normalized:
-                    subject_folder_name = sanitize_folder_name(subject)
-                    destination_folder = dest_dir / subject_folder_name
-                    found_match = True
-                    break 
-
-            if not found_match:
-                if manage_others == 'mover':
-                    destination_folder = other_dir
-                else: 
-                    log_messages.append(f"Omitiendo (no coincide): {item.name}")
-                    report["omitidos"] += 1
-                    continue
+    executor.close()
+    if journal is not None:
+        # Cancelar también cierra la bitácora: lo que el usuario detuvo no se retoma solo
+        journal.close(cancelada=report["cancelado"])
+        if journal.discarded: # No movió nada: no hay corrida que deshacer
+            del report["corrida"]
+    record_run_metrics(metrics, [executor], report, run_started, profile_id)
+    if checkpoint is not None:
+        checkpoint.save(complete=not report["cancelado"])
+    if report["sin_cambios"]:
+        log_messages.append(f"Se saltaron {report['sin_cambios']} items sin cambios (ya revisados antes).")
 
-            try:
-                final_destination = destination_folder / item.name
-                final_destination = handle_duplicates(final_destination)
-                shutil.move(str(item), str(final_destination))
-                
-                if final_destination.name != item.name:
-                    log_messages.append(f"Renombrado: '{item.name}' -> '{final_destination.name}'")
-                    report["renombrados"] += 1
-                else:
-                    log_messages.append(f"Movido: '{item.name}' -> (en {destination_folder.name})")
-                report["movidos"] += 1
+    if report["cancelado"]:
+        log_messages.append(f"Organización cancelada después de {items_seen} items.")
+        return report
 
-            except (IOError, OSError, shutil.Error) as move_error:
-                log_messages.append(f"ERROR al mover '{item.name}': {move_error}")
-                report["omitidos"] += 1
-            
-    except Exception as e:
-        log_messages.append(f"ERROR CRÍTICO al procesar items: {e}")
+    if not items_seen:
+        log_messages.append("AVISO: La carpeta de origen está vacía.")
         return report
 
+    log_messages.append(f"Se analizaron {items_seen} items.")
     log_messages.append("¡Organización Completada!")
     return report
 
@@ -271,6 +2169,7 @@ def organize_by_subject(source_dir: Path, dest_dir: Path, subjects: list[str], m
 @app.route('/')
 def home():
     """Sirve el archivo HTML principal."""
+    mark_startup("primera_pagina")
     # Flask buscará 'index.html' en la carpeta 'templates'
     return render_template('index.html')
 
@@ -278,7 +2177,7 @@ def home():
 def api_get_profiles():
     """Envía todos los perfiles guardados al HTML."""
     print("Petición recibida: /api/get-profiles")
-    profiles = load_profiles()
+    profiles = PROFILE_STORE.all()
     # Convertimos el diccionario a una lista para que sea más fácil de usar en JS
     return jsonify(list(profiles.values()))
 
@@ -327,10 +2226,6 @@ def api_create_profile():
     if not is_valid_name(data['nombre_visible']):
         return jsonify({"success": False, "error": "El nombre del perfil debe tener letras."}), 400
 
-    profiles_data = load_profiles()
-    if any(p['nombre_visible'].lower() == data['nombre_visible'].lower() for p in profiles_data.values()):
-        return jsonify({"success": False, "error": "Ese nombre de perfil ya existe."}), 400
-
     # Procesar materias
     subjects_list = []
     for subject in data['lista_materias'].split(","):
@@ -359,93 +2254,1101 @@ def api_create_profile():
         'manejo_otros': data.get('manejo_otros', 'mover')
     }
     
-    profiles_data[new_id] = new_profile
-    save_profiles(profiles_data)
+    with PROFILE_STORE.lock:
+        # Revisar otra vez con el candado: otra petición pudo crear el mismo nombre
+        if any(p['nombre_visible'].lower() == new_profile['nombre_visible'].lower()
+               for p in PROFILE_STORE.all().values()):
+            return jsonify({"success": False, "error": "Ese nombre de perfil ya existe."}), 400
+        PROFILE_STORE.add(new_profile)
     log_admin_action("PROFILE_CREATED_API")
     
     return jsonify({"success": True, "new_profile": new_profile})
 
 
-@app.route('/api/run-profile', methods=['POST'])
-def api_run_profile():
-    """Recibe un ID de perfil y ejecuta la organización."""
-    data = request.json
-    profile_id = data.get('id')
-    print(f"Petición recibida: /api/run-profile (ID: {profile_id})")
+# Un perfil no puede correr dos veces a la vez (dos pestañas, corrida + vigilancia):
+# las dos moverían los mismos archivos y pisarían el mismo checkpoint.
+PROFILE_RUN_LOCKS = {}
+PROFILE_RUN_LOCKS_GUARD = threading.Lock()
+PROFILE_BUSY_ERROR = "Este perfil ya se está ejecutando. Espera a que termine."
+
+def profile_run_lock(profile_id: str) -> threading.Lock:
+    with PROFILE_RUN_LOCKS_GUARD:
+        lock = PROFILE_RUN_LOCKS.get(profile_id)
+        if lock is None:
+            lock = PROFILE_RUN_LOCKS[profile_id] = threading.Lock()
+        return lock
 
-    profiles_data = load_profiles()
+def prepare_profile_run(data: dict):
+    """
+    Valida la petición de ejecución y arma los argumentos de organize_by_subject.
+    Devuelve (profile, run_kwargs, None) o (None, None, (error, código)).
+    """
+    profile_id = (data or {}).get('id')
+    profile = PROFILE_STORE.get(profile_id) if profile_id else None
     
-    if not profile_id or profile_id not in profiles_data:
-        return jsonify({"success": False, "error": "Perfil no encontrado."}), 404
+    if profile is None:
+        return None, None, ("Perfil no encontrado.", 404)
         
     try:
-        profile = profiles_data[profile_id]
         source_dir = Path(profile['ruta_origen'])
         dest_parent_dir = Path(profile['ruta_destino'])
 
         if not source_dir.exists():
-            return jsonify({"success": False, "error": f"La carpeta de ORIGEN no existe: {source_dir}"}), 400
+            return None, None, (f"La carpeta de ORIGEN no existe: {source_dir}", 400)
         if not dest_parent_dir.exists():
-            return jsonify({"success": False, "error": f"La carpeta de DESTINO no existe: {dest_parent_dir}"}), 400
+            return None, None, (f"La carpeta de DESTINO no existe: {dest_parent_dir}", 400)
 
         main_folder_name = profile['nombre_carpeta_principal']
         subjects = profile['lista_materias_pipe'].split(MATERIAS_SEPARATOR)
         manage_others = profile.get('manejo_otros', 'mover')
         final_dest_dir = dest_parent_dir / main_folder_name
+        workers = int(data.get('hilos', 1)) # Opcional: hilos para mover en paralelo
+        duplicates = data.get('duplicados') or 'renombrar' # Opcional: ver DUPLICATE_MODES
+        scan_options = parse_scan_options(data)
+
+    except Exception as e:
+        return None, None, (f"Error al cargar perfil: {e}", 500)
+
+    if duplicates not in DUPLICATE_MODES:
+        return None, None, (f"Modo de duplicados inválido: '{duplicates}'. Usa: {', '.join(DUPLICATE_MODES)}.", 400)
+
+    run_kwargs = {
+        'profile_id': profile['id_perfil'],
+        'source_dir': source_dir,
+        'dest_dir': final_dest_dir,
+        'subjects': subjects,
+        'manage_others': manage_others,
+        'workers': workers,
+        'scan_options': scan_options,
+        'duplicates': duplicates,
+        # 'revisar_todo': ignorar el checkpoint y volver a clasificar todo.
+        # El modo recursivo no usa checkpoint (una carpeta sin cambios puede tener cambios adentro).
+        'checkpoint': None if scan_options.recursive else
+                      ScanCheckpoint.load(profile['id_perfil'], subjects, manage_others,
+                                          final_dest_dir, fresh=bool(data.get('revisar_todo')),
+                                          content=scan_options.content),
+    }
+
+    # Opcional: aplicar un plan calculado antes con /api/preview-profile
+    plan_id = data.get('plan_id')
+    if plan_id:
+        plan = take_plan(plan_id)
+        if plan is None or plan.profile_id != profile['id_perfil']:
+            return None, None, ("El plan no existe o ya expiró. Vuelve a generar la vista previa.", 404)
+        run_kwargs.update(source_dir=plan.source_dir, dest_dir=plan.dest_dir,
+                          subjects=plan.subjects, manage_others=plan.manage_others, plan=plan,
+                          checkpoint=plan.checkpoint, scan_options=None)
+    return profile, run_kwargs, None
+
+def parse_scan_options(data: dict) -> ScanOptions:
+    """
+    Opciones de recorrido de la petición: 'recursivo' (bool), 'profundidad_maxima'
+    (int), 'excluir' (lista de patrones o texto separado por comas) y
+    'contenido' (bool, clasificar también por lo que dice el archivo).
+    """
+    exclude = data.get('excluir') or ()
+    if isinstance(exclude, str):
+        exclude = exclude.split(",")
+    return ScanOptions(
+        recursive=bool(data.get('recursivo', False)),
+        max_depth=max(0, int(data.get('profundidad_maxima', RECURSIVE_MAX_DEPTH))),
+        exclude=tuple(p.strip() for p in exclude if p.strip()),
+        content=bool(data.get('contenido', False)),
+    )
 
+def finish_profile_run(profile: dict, report: dict) -> dict:
+    """
+    Actualiza el contador y la fecha de uso del perfil después de una corrida.
+    Devuelve el perfil actualizado (el guardado a disco ocurre en segundo plano).
+    """
+    try:
+        total_moved = report.get('movidos', 0) + report.get('renombrados', 0)
+        updated = PROFILE_STORE.record_run(profile['id_perfil'], total_moved)
+        return updated if updated is not None else profile
     except Exception as e:
-        return jsonify({"success": False, "error": f"Error al cargar perfil: {e}"}), 500
+        print_error(f"Error al actualizar y guardar el perfil: {e}")
+        return profile
+
+@app.route('/api/run-profile', methods=['POST'])
+def api_run_profile():
+    """Recibe un ID de perfil y ejecuta la organización."""
+    data = request.json
+    print(f"Petición recibida: /api/run-profile (ID: {data.get('id')})")
+
+    profile, run_kwargs, error = prepare_profile_run(data)
+    if error:
+        return jsonify({"success": False, "error": error[0]}), error[1]
+
+    run_lock = profile_run_lock(profile['id_perfil'])
+    if not run_lock.acquire(blocking=False):
+        return jsonify({"success": False, "error": PROFILE_BUSY_ERROR}), 409
 
     # --- Ejecución ---
     log_admin_action("ORGANIZATION_RUN_API")
     start_time = time.time()
     
-    report = organize_by_subject(
-        source_dir, 
-        final_dest_dir, 
-        subjects, 
-        manage_others=manage_others
-    )
+    try:
+        report = organize_by_subject(**run_kwargs)
+    finally:
+        run_lock.release()
     
     end_time = time.time()
     total_time = f"{end_time - start_time:.2f}"
     
     # --- Actualizar Perfil y Guardar ---
-    try:
-        profile['ultimo_uso_timestamp'] = datetime.now().isoformat()
-        total_moved = report.get('movidos', 0) + report.get('renombrados', 0)
-        if total_moved > 0:
-            profile['contador_archivos_movidos'] += total_moved
-        save_profiles(profiles_data) # Guardar todos los perfiles actualizados
-    except Exception as e:
-        print_error(f"Error al actualizar y guardar el perfil: {e}")
+    profile = finish_profile_run(profile, report)
 
     return jsonify({
         "success": True, 
-        "report": report, 
+        "report": report_json(report), # Solo la cola del log: el resto en /api/run-log/<log_id>
         "total_time": total_time,
         "updated_profile": profile
     })
 
+@app.route('/api/run-log/<log_id>', methods=['GET'])
+def api_run_log(log_id):
+    """Una página del log completo de una corrida: '?desde=N&limite=M' (líneas)."""
+    with RUN_LOGS_LOCK:
+        logs = RUN_LOGS.get(log_id)
+    if logs is None:
+        return jsonify({"success": False, "error": "El log no existe o ya se descartó."}), 404
+    log_offset = request.args.get('desde', default=0, type=int)
+    limit = min(request.args.get('limite', default=RUN_LOG_PAGE_LIMIT, type=int), RUN_LOG_PAGE_LIMIT)
+    lines = logs.page(log_offset, limit)
+    return jsonify({
+        "success": True,
+        "log_id": log_id,
+        "logs": lines,
+        "siguiente_log": max(0, log_offset) + len(lines),
+        "total": len(logs),
+    })
+
+
+# --- (NUEVO) Varios perfiles en una sola corrida ---
+# Los perfiles que comparten carpeta de origen (casi siempre Descargas) se
+# escanean y normalizan UNA vez: cada item va al primer perfil de la lista que
+# coincide. Los grupos con orígenes distintos corren en paralelo.
+
+class CheckpointGroup:
+    """
+    Los ScanCheckpoint de los perfiles de un escaneo compartido, usados como
+    uno solo. Un item se salta solo si TODOS los perfiles ya lo omitieron sin
+    cambios (no coincide con ninguno), y lo que no coincide con ninguno se
+    anota en todos.
+    """
+
+    def __init__(self, checkpoints: list):
+        self.checkpoints = checkpoints
+
+    def is_unchanged(self, entry) -> bool:
+        return all(checkpoint.is_unchanged(entry) for checkpoint in self.checkpoints)
+
+    def remember(self, entry):
+        for checkpoint in self.checkpoints:
+            checkpoint.remember(entry)
+
+    def save(self, complete: bool = True):
+        for checkpoint in self.checkpoints:
+            checkpoint.save(complete)
+
+def organize_shared_source(group: list, workers: int = 1, scan_options: ScanOptions = None):
+    """
+    Organiza varios perfiles con la misma carpeta de origen en un solo escaneo.
+    'group' es una lista de (profile, run_kwargs) en orden de prioridad.
+    Lo que no coincide con ninguno va a "Otros" del primer perfil con manejo
+    'mover'. Los omitidos quedan en el reporte del primer perfil.
+    Los checkpoints de los perfiles se usan y se guardan juntos (CheckpointGroup).
+    Devuelve (reportes por perfil, resumen del grupo).
+    """
+    run_started = time.perf_counter_ns()
+    metrics = RunMetrics()
+    source_dir = group[0][1]['source_dir']
+    profile_ids = [profile['id_perfil'] for profile, _ in group]
+    reports = [new_report() for _ in group]
+    for report in reports:
+        report["logs"].append(f"Iniciando organización (escaneo compartido: {len(group)} perfiles)...")
+        report["logs"].append(f"Buscando en: {source_dir}")
+
+    folders_started = time.perf_counter_ns()
+    matchers = []
+    owners = {} # carpeta destino -> índice del perfil dueño
+    other_dir = None
+    for index, (_, run_kwargs) in enumerate(group):
+        matcher = SubjectMatcher(run_kwargs['subjects'], run_kwargs['dest_dir'])
+        matchers.append(matcher)
+        for folder in matcher.folders:
+            os.makedirs(folder, exist_ok=True)
+            owners.setdefault(folder, index)
+        if other_dir is None and run_kwargs['manage_others'] == 'mover':
+            other_dir = run_kwargs['dest_dir'] / "Otros"
+            os.makedirs(other_dir, exist_ok=True)
+            owners.setdefault(other_dir, index)
+    combined = SubjectMatcher.combine(matchers)
+    metrics.stage_ns["crear_carpetas"] += time.perf_counter_ns() - folders_started
+
+    executors = []
+    for index, (profile, run_kwargs) in enumerate(group):
+        journal = MoveJournal.start(profile['id_perfil'], source_dir, run_kwargs['dest_dir'])
+        if journal is not None:
+            reports[index]["corrida"] = journal.run_id
+        executors.append(MoveExecutor(reports[index], source_dir, workers, profile['id_perfil'],
+                                      run_kwargs['duplicates'], journal))
+    content = ScanOptions(content=scan_options.content) if scan_options is not None else None
+    checkpoints = [run_kwargs['checkpoint'] for _, run_kwargs in group]
+    checkpoint = CheckpointGroup(checkpoints) if all(c is not None for c in checkpoints) else None
+    items_seen = 0
+    try:
+        for executor in executors:
+            resume_interrupted_runs(executor.profile_id, executor, executor.report)
+        dest_dir = group[0][1]['dest_dir']
+        for entry in scan_entries(source_dir, dest_dir, combined, other_dir, checkpoint, content, metrics):
+            items_seen += 1
+            owner = 0 if entry.skip_reason is not None else owners[entry.destination]
+            reports[owner]["escaneados"] += 1
+            if entry.skip_reason == "sin cambios":
+                reports[owner]["sin_cambios"] += 1 # Sin línea de log, como en dispatch_entries
+                continue
+            if entry.skip_reason is not None:
+                executors[owner].skip(entry.name, entry.skip_reason)
+                continue
+            executors[owner].move(entry.name, entry.source, entry.destination, entry.is_file, entry.size)
+    except Exception as e:
+        for report in reports:
+            report["logs"].append(f"ERROR CRÍTICO al procesar items: {e}")
+        checkpoint = None # Escaneo a medias: no se guarda
+    finally:
+        for executor, report in zip(executors, reports):
+            executor.close()
+            if executor.journal is not None:
+                executor.journal.close()
+                if executor.journal.discarded:
+                    del report["corrida"]
+    if checkpoint is not None:
+        checkpoint.save()
+
+    summary = {"ruta_origen": str(source_dir), "perfiles": profile_ids, "escaneados": items_seen}
+    record_run_metrics(metrics, executors, summary, run_started, ",".join(profile_ids))
+    if reports[0]["sin_cambios"]:
+        reports[0]["logs"].append(f"Se saltaron {reports[0]['sin_cambios']} items sin cambios (ya revisados antes).")
+    for report in reports:
+        report["logs"].append(f"Se analizaron {items_seen} items (compartidos entre {len(group)} perfiles).")
+        report["logs"].append("¡Organización Completada!")
+    return reports, summary
+
+def chain_shared_destinations(groups: list) -> list:
+    """
+    Junta en cadenas los grupos de /api/run-profiles que escriben en la misma
+    carpeta principal: cada cadena corre sus grupos uno tras otro (en orden de
+    prioridad) y solo las cadenas distintas corren en paralelo. Devuelve las
+    posiciones de los grupos en cada cadena.
+    """
+    chains = [] # [(carpetas destino, [posiciones])]
+    for position, group in enumerate(groups):
+        destinations = {os.path.normcase(os.path.abspath(run_kwargs['dest_dir'])) for _, run_kwargs, _ in group}
+        members = [position]
+        for chain in [chain for chain in chains if chain[0] & destinations]:
+            chains.remove(chain)
+            destinations |= chain[0]
+            members += chain[1]
+        chains.append((destinations, sorted(members)))
+    return [members for _, members in chains]
+
+@app.route('/api/run-profiles', methods=['POST'])
+def api_run_profiles():
+    """
+    Ejecuta varios perfiles: {"ids": [...]} en orden de prioridad (más 'hilos',
+    'duplicados', 'contenido' y 'revisar_todo' opcionales, como en /api/run-profile).
+    """
+    data = request.json or {}
+    profile_ids = list(dict.fromkeys(data.get('ids') or [])) # Sin repetidos, respetando el orden
+    print(f"Petición recibida: /api/run-profiles (IDs: {profile_ids})")
+    if not profile_ids:
+        return jsonify({"success": False, "error": "No se indicó ningún perfil."}), 400
+
+    errors = {}
+    groups = {} # carpeta de origen -> [(profile, run_kwargs, lock)] en orden de prioridad
+    for profile_id in profile_ids:
+        options = {key: data[key] for key in ('hilos', 'duplicados', 'contenido', 'revisar_todo') if key in data}
+        profile, run_kwargs, error = prepare_profile_run({'id': profile_id, **options})
+        if error:
+            errors[profile_id] = error[0]
+            continue
+        run_lock = profile_run_lock(profile_id)
+        if not run_lock.acquire(blocking=False):
+            errors[profile_id] = PROFILE_BUSY_ERROR
+            continue
+        source_key = os.path.normcase(os.path.abspath(run_kwargs['source_dir']))
+        groups.setdefault(source_key, []).append((profile, run_kwargs, run_lock))
+
+    start_time = time.time()
+    group_list = list(groups.values())
+
+    def run_group(group):
+        try:
+            if len(group) == 1: # Un solo perfil en esa carpeta: corrida normal
+                _, run_kwargs, _ = group[0]
+                return [organize_by_subject(**run_kwargs)], None
+            return organize_shared_source([(profile, run_kwargs) for profile, run_kwargs, _ in group],
+                                          group[0][1]['workers'], group[0][1]['scan_options'])
+        finally:
+            for _, _, run_lock in group:
+                run_lock.release()
+
+    def run_chain(chain):
+        return [(position, run_group(group_list[position])) for position in chain]
+
+    reports, updated_profiles, summaries = {}, {}, []
+    if groups:
+        log_admin_action("ORGANIZATION_BATCH_API") # Solo si de verdad corre algún grupo
+        chains = chain_shared_destinations(group_list)
+        results = [None] * len(group_list)
+        with ThreadPoolExecutor(max_workers=len(chains), thread_name_prefix="lote") as pool:
+            for chain_results in pool.map(run_chain, chains):
+                for position, result in chain_results:
+                    results[position] = result
+        for group, (group_reports, summary) in zip(group_list, results):
+            if summary is not None:
+                summaries.append(summary)
+            for (profile, _, _), report in zip(group, group_reports):
+                reports[profile['id_perfil']] = report_json(report)
+                updated_profiles[profile['id_perfil']] = finish_profile_run(profile, report)
+
+    return jsonify({
+        "success": bool(reports),
+        "reports": reports,
+        "errors": errors,
+        "shared_scans": summaries,
+        "total_time": f"{time.time() - start_time:.2f}",
+        "updated_profiles": updated_profiles,
+    }), 200 if reports else 400
+
+
+# --- (NUEVO) Deshacer una corrida ---
+
+def find_undo_journal(profile_id: str, run_id: str = None):
+    """
+    La bitácora que se va a deshacer: la de 'run_id', o la última corrida
+    terminada del perfil que movió algo y no se ha deshecho.
+    """
+    if run_id:
+        if Path(run_id).name != run_id: # Solo un nombre, nada de rutas
+            return None
+        path = JOURNAL_DIR / profile_id / f"{run_id}.jsonl"
+        return path if path.exists() else None
+    for path in reversed(profile_journals(profile_id)):
+        try:
+            header, moves = read_journal(path)
+        except OSError:
+            continue
+        if "fin" not in header or "deshecho_fin" in header:
+            continue
+        if any(move["hecho"] and not move["deshecho"] for move in moves.values()):
+            return path
+    return None
+
+@app.route('/api/undo-run', methods=['POST'])
+def api_undo_run():
+    """
+    Devuelve a su carpeta de origen lo que movió una corrida: {"id": perfil},
+    más 'corrida' (por defecto la última) e 'hilos' opcionales.
+    """
+    data = request.json or {}
+    profile_id = data.get('id')
+    print(f"Petición recibida: /api/undo-run (ID: {profile_id})")
+    if not profile_id or PROFILE_STORE.get(profile_id) is None:
+        return jsonify({"success": False, "error": "Perfil no encontrado."}), 404
+    journal_path = find_undo_journal(profile_id, data.get('corrida'))
+    if journal_path is None:
+        return jsonify({"success": False, "error": "No hay ninguna corrida que deshacer."}), 404
+
+    run_lock = profile_run_lock(profile_id)
+    if not run_lock.acquire(blocking=False):
+        return jsonify({"success": False, "error": PROFILE_BUSY_ERROR}), 409
+    log_admin_action("UNDO_RUN_API", profile_id=profile_id)
+    start_time = time.time()
+    try:
+        result = undo_run(journal_path, int(data.get('hilos', MAX_MOVE_WORKERS)))
+    except (OSError, ValueError) as e:
+        return jsonify({"success": False, "error": f"No se pudo deshacer la corrida: {e}"}), 500
+    finally:
+        run_lock.release()
+
+    return jsonify({
+        "success": True,
+        "report": report_json(result),
+        "total_time": f"{time.time() - start_time:.2f}",
+    })
+
+
+# --- Métricas de rendimiento ---
+# Cada corrida deja sus tiempos por etapa (RunMetrics) en un historial corto
+# en memoria, más totales acumulados desde que se abrió la app.
+
+METRICS_HISTORY = deque(maxlen=METRICS_HISTORY_LIMIT)
+METRICS_TOTALS = RunMetrics()
+METRICS_RUNS = 0
+METRICS_LOCK = threading.Lock()
+
+def record_run_metrics(metrics: RunMetrics, executors: list, report: dict,
+                       run_started: int, profile_id: str = ""):
+    """Junta los tiempos del escaneo y de los movimientos, y los guarda en el reporte y el historial."""
+    global METRICS_RUNS
+    for executor in executors:
+        metrics.merge(executor.metrics)
+    metrics.items_seen = report["escaneados"]
+    metrics.total_ns = time.perf_counter_ns() - run_started
+    summary = metrics.to_json()
+    report["metricas"] = summary
+    with METRICS_LOCK:
+        METRICS_TOTALS.merge(metrics)
+        METRICS_RUNS += 1
+        METRICS_HISTORY.append({"profile_id": profile_id,
+                                "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), **summary})
+
+def metrics_prometheus(totals: RunMetrics, runs: int, last: dict = None) -> str:
+    """Los mismos datos de /api/metrics en formato de texto de Prometheus."""
+    lines = [
+        "# HELP organizador_corridas_total Corridas terminadas desde que inició la app.",
+        "# TYPE organizador_corridas_total counter",
+        f"organizador_corridas_total {runs}",
+        "# HELP organizador_etapa_segundos_total Tiempo acumulado por etapa.",
+        "# TYPE organizador_etapa_segundos_total counter",
+    ]
+    lines += [f'organizador_etapa_segundos_total{{etapa="{stage}"}} {ns / 1e9:.6f}'
+              for stage, ns in totals.stage_ns.items()]
+    lines += [
+        "# HELP organizador_archivos_movidos_total Archivos movidos.",
+        "# TYPE organizador_archivos_movidos_total counter",
+        f"organizador_archivos_movidos_total {totals.files_moved}",
+        "# HELP organizador_bytes_movidos_total Bytes movidos.",
+        "# TYPE organizador_bytes_movidos_total counter",
+        f"organizador_bytes_movidos_total {totals.bytes_moved}",
+    ]
+    if last is not None:
+        lines += [
+            "# HELP organizador_ultima_corrida_segundos Duración de la última corrida.",
+            "# TYPE organizador_ultima_corrida_segundos gauge",
+            f"organizador_ultima_corrida_segundos {last['total_s']}",
+            "# HELP organizador_ultima_corrida_archivos_por_segundo Velocidad de la última corrida.",
+            "# TYPE organizador_ultima_corrida_archivos_por_segundo gauge",
+            f"organizador_ultima_corrida_archivos_por_segundo {last['archivos_por_segundo']}",
+        ]
+    return "\n".join(lines) + "\n"
+
+@app.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    """Tiempos por etapa de las últimas corridas (?formato=prometheus para texto de Prometheus)."""
+    with METRICS_LOCK:
+        history = list(METRICS_HISTORY)
+        totals = RunMetrics()
+        totals.merge(METRICS_TOTALS)
+        runs = METRICS_RUNS
+    if request.args.get('formato') == 'prometheus':
+        return Response(metrics_prometheus(totals, runs, history[-1] if history else None),
+                        mimetype='text/plain; version=0.0.4')
+    return jsonify({"success": True, "corridas_totales": runs, "totales": totals.to_json(),
+                    "historial": history, "arranque": dict(STARTUP_TIMES)})
+
+# --- (NUEVO) Vista previa: plan sin tocar el disco ---
+# El plan queda guardado unos minutos; /api/run-profile o /api/jobs/run-profile
+# con {"id": ..., "plan_id": ...} lo aplican sin volver a clasificar.
+
+PLANS = {}
+PLANS_LOCK = threading.Lock()
+
+def store_plan(plan: OrganizationPlan):
+    with PLANS_LOCK:
+        now = time.time()
+        for plan_id in [pid for pid, p in PLANS.items() if now - p.created > PLAN_TTL]:
+            del PLANS[plan_id]
+        while len(PLANS) >= PLAN_CACHE_LIMIT:
+            del PLANS[min(PLANS, key=lambda pid: PLANS[pid].created)]
+        PLANS[plan.id] = plan
+
+def take_plan(plan_id: str):
+    """Saca un plan de la caché (un plan se aplica una sola vez)."""
+    with PLANS_LOCK:
+        plan = PLANS.pop(plan_id, None)
+    if plan is not None and time.time() - plan.created > PLAN_TTL:
+        return None
+    return plan
+
+@app.route('/api/preview-profile', methods=['POST'])
+def api_preview_profile():
+    """Calcula qué se movería, a dónde y con qué nombre, sin mover nada."""
+    data = request.json
+    print(f"Petición recibida: /api/preview-profile (ID: {data.get('id')})")
+
+    # Mismas opciones de recorrido que la corrida (pero sin 'plan_id')
+    options = {key: data[key] for key in ('id', 'revisar_todo', 'recursivo', 'profundidad_maxima',
+                                          'excluir', 'contenido')
+               if key in data}
+    profile, run_kwargs, error = prepare_profile_run(options)
+    if error:
+        return jsonify({"success": False, "error": error[0]}), error[1]
+
+    start_time = time.time()
+    try:
+        plan = plan_organization(run_kwargs['source_dir'], run_kwargs['dest_dir'],
+                                 run_kwargs['subjects'], run_kwargs['manage_others'],
+                                 profile_id=profile['id_perfil'], checkpoint=run_kwargs['checkpoint'],
+                                 scan_options=run_kwargs['scan_options'])
+    except OSError as e:
+        return jsonify({"success": False, "error": f"No se pudo leer la carpeta de origen: {e}"}), 500
+    store_plan(plan)
+
+    return jsonify({"success": True, "total_time": f"{time.time() - start_time:.2f}", **plan.to_json()})
+
+
+# --- (NUEVO) Corridas en segundo plano ("jobs") ---
+# /api/run-profile bloquea hasta terminar. Estas rutas arrancan la corrida en un
+# hilo y devuelven un job_id al instante; el HTML consulta el progreso
+# (por polling o Server-Sent Events) y puede cancelar.
+
+class RunJob:
+    """Una corrida de perfil en segundo plano. Comparte el 'report' en vivo."""
+
+    def __init__(self, profile_id: str):
+        self.id = uuid.uuid4().hex
+        self.profile_id = profile_id
+        self.report = new_report()
+        register_run_log(self.report["logs"])
+        self.cancel_event = threading.Event()
+        self.status = "en_curso" # en_curso | completado | cancelado | error
+        self.error = None
+        self.updated_profile = None
+        self.started = time.time()
+        self.finished = None
+
+    def snapshot(self, log_offset: int = 0, log_limit: int = 0) -> dict:
+        """
+        Contadores y velocidad. Las líneas de log solo si se piden: hasta
+        'log_limit' (una página como mucho) desde 'log_offset'. El log completo
+        se lee aparte con /api/run-log/<log_id>.
+        """
+        report = self.report
+        elapsed = (self.finished or time.time()) - self.started
+        log_limit = min(log_limit, RUN_LOG_PAGE_LIMIT)
+        logs = report["logs"].page(log_offset, log_limit) if log_limit > 0 else []
+        return {
+            "job_id": self.id,
+            "profile_id": self.profile_id,
+            "status": self.status,
+            "error": self.error,
+            "movidos": report["movidos"],
+            "renombrados": report["renombrados"],
+            "duplicados": report["duplicados"],
+            "omitidos": report["omitidos"],
+            "escaneados": report["escaneados"],
+            "items_por_segundo": round(report["escaneados"] / elapsed, 1) if elapsed > 0 else 0.0,
+            "total_time": f"{elapsed:.2f}",
+            "metricas": report.get("metricas"), # Al terminar: tiempos por etapa
+            "logs": logs,
+            "siguiente_log": max(0, log_offset) + len(logs),
+            "logs_total": len(report["logs"]),
+            "log_id": report["logs"].id,
+            "updated_profile": self.updated_profile,
+        }
+
+RUN_JOBS = {}
+RUN_JOBS_LOCK = threading.Lock()
+JOB_HISTORY_LIMIT = 20 # Corridas terminadas que se recuerdan para consulta
+
+def _run_job(job: RunJob, profile: dict, run_kwargs: dict, run_lock: threading.Lock):
+    try:
+        organize_by_subject(report=job.report, cancel_event=job.cancel_event, **run_kwargs)
+        job.updated_profile = finish_profile_run(profile, job.report)
+        job.status = "cancelado" if job.report["cancelado"] else "completado"
+    except Exception as e:
+        job.error = str(e)
+        job.status = "error"
+        print_error(f"La corrida {job.id} falló: {e}")
+    finally:
+        run_lock.release()
+        job.finished = time.time()
+
+def _forget_old_jobs():
+    finished = [j for j in RUN_JOBS.values() if j.finished is not None]
+    finished.sort(key=lambda j: j.finished)
+    for job in finished[:max(0, len(finished) - JOB_HISTORY_LIMIT)]:
+        del RUN_JOBS[job.id]
+
+def _get_job(job_id: str):
+    with RUN_JOBS_LOCK:
+        return RUN_JOBS.get(job_id)
+
+@app.route('/api/jobs/run-profile', methods=['POST'])
+def api_start_run_job():
+    """Arranca la organización en segundo plano y devuelve el job_id al instante."""
+    data = request.json
+    print(f"Petición recibida: /api/jobs/run-profile (ID: {data.get('id')})")
+
+    profile, run_kwargs, error = prepare_profile_run(data)
+    if error:
+        return jsonify({"success": False, "error": error[0]}), error[1]
+
+    run_lock = profile_run_lock(profile['id_perfil'])
+    if not run_lock.acquire(blocking=False):
+        return jsonify({"success": False, "error": PROFILE_BUSY_ERROR}), 409
+
+    log_admin_action("ORGANIZATION_RUN_API")
+    job = RunJob(profile['id_perfil'])
+    with RUN_JOBS_LOCK:
+        _forget_old_jobs()
+        RUN_JOBS[job.id] = job
+    threading.Thread(target=_run_job, args=(job, profile, run_kwargs, run_lock),
+                     name=f"job-{job.id[:8]}", daemon=True).start()
+    return jsonify({"success": True, "job_id": job.id}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    """
+    Progreso de una corrida (polling): solo contadores. Con '?limite=M' (y
+    '?desde=N' para pedir solo los nuevos) también devuelve líneas de log.
+    """
+    job = _get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Corrida no encontrada."}), 404
+    log_offset = request.args.get('desde', default=0, type=int)
+    log_limit = request.args.get('limite', default=0, type=int)
+    return jsonify({"success": True, **job.snapshot(log_offset, log_limit)})
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def api_job_stream(job_id):
+    """
+    Progreso de una corrida como Server-Sent Events, hasta que termine.
+    Igual que el polling: líneas de log solo con '?limite=M' por evento.
+    """
+    job = _get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Corrida no encontrada."}), 404
+    log_limit = request.args.get('limite', default=0, type=int)
+
+    def events():
+        log_offset = 0
+        while True:
+            done = job.finished is not None
+            snapshot = job.snapshot(log_offset, log_limit)
+            log_offset = snapshot["siguiente_log"]
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            if done:
+                return
+            time.sleep(JOB_STREAM_INTERVAL)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    """Pide detener una corrida. Los movimientos ya hechos no se deshacen."""
+    job = _get_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Corrida no encontrada."}), 404
+    job.cancel_event.set()
+    return jsonify({"success": True, "status": job.status})
+
+
+# --- (NUEVO) Modo vigilancia: organizar los archivos conforme llegan ---
+# En vez de escanear toda la carpeta al dar clic en "Ejecutar", un hilo por
+# perfil espera avisos del sistema (inotify en Linux; si no hay, revisa la
+# carpeta cada WATCH_POLL_INTERVAL segundos) y mueve cada archivo nuevo en
+# cuanto deja de cambiar, con la misma lógica de materias y duplicados.
+
+class _PathEntry:
+    """Imita un os.DirEntry para un solo archivo (lo que usa classify_items)."""
+
+    def __init__(self, path: Path):
+        self.name = path.name
+        self.path = str(path)
+        self._stat = os.lstat(path)
+
+    def is_symlink(self) -> bool:
+        return stat.S_ISLNK(self._stat.st_mode)
+
+    def is_file(self) -> bool:
+        return stat.S_ISREG(self._stat.st_mode)
+
+    def is_dir(self) -> bool:
+        return stat.S_ISDIR(self._stat.st_mode)
+
+    def stat(self, follow_symlinks: bool = True):
+        return self._stat
+
+class _InotifyBackend:
+    """Avisos del kernel de Linux (inotify) vía ctypes, sin dependencias extra."""
+
+    _IN_MODIFY = 0x002
+    _IN_CLOSE_WRITE = 0x008
+    _IN_MOVED_TO = 0x080
+    _IN_CREATE = 0x100
+    _IN_Q_OVERFLOW = 0x4000
+    _EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, len
+
+    def __init__(self, folder: Path):
+        import ctypes, ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        mask = self._IN_MODIFY | self._IN_CLOSE_WRITE | self._IN_MOVED_TO | self._IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(str(folder)), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch falló en {folder}")
+
+    def wait(self, timeout: float):
+        """Nombres que cambiaron, o None si hay que revisar la carpeta completa."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        names = set()
+        offset = 0
+        while offset + self._EVENT_HEADER.size <= len(data):
+            _, mask, _, length = self._EVENT_HEADER.unpack_from(data, offset)
+            offset += self._EVENT_HEADER.size
+            if mask & self._IN_Q_OVERFLOW:
+                return None # El kernel perdió eventos
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self._fd)
+
+class _PollingBackend:
+    """Respaldo portátil: compara (tamaño, fecha) de cada nombre entre revisiones."""
+
+    def __init__(self, folder: Path, interval: float = None):
+        self.folder = folder
+        self.interval = WATCH_POLL_INTERVAL if interval is None else interval
+        self._snapshot = self._scan()
+        self._last_scan = time.monotonic()
+
+    def _scan(self) -> dict:
+        snapshot = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                        snapshot[entry.name] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return snapshot
+
+    def wait(self, timeout: float):
+        remaining = self._last_scan + self.interval - time.monotonic()
+        if remaining > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0.0, remaining))
+        self._last_scan = time.monotonic()
+        current = self._scan()
+        changed = {name for name, info in current.items() if self._snapshot.get(name) != info}
+        self._snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+def make_watch_backend(folder: Path):
+    """inotify si el sistema lo tiene; si no, revisión periódica."""
+    if sys.platform.startswith('linux'):
+        try:
+            return _InotifyBackend(folder)
+        except (OSError, AttributeError) as e:
+            print_warning(f"inotify no disponible ({e}); se usará revisión periódica.")
+    return _PollingBackend(folder)
+
+class FolderWatcher:
+    """
+    Vigila la carpeta de origen de un perfil. Cada archivo nuevo espera
+    WATCH_DEBOUNCE segundos sin cambios (descargas a medias, copias largas)
+    y luego pasa por classify_items + MoveExecutor, como una corrida normal
+    de un solo archivo. Cada lote deja su propia bitácora (MoveJournal):
+    se puede deshacer con /api/undo-run y, si se interrumpe, la retoma la
+    siguiente corrida del perfil.
+    """
+
+    def __init__(self, profile: dict, run_kwargs: dict):
+        self.profile = profile
+        self.profile_id = profile['id_perfil']
+        self.source_dir = run_kwargs['source_dir']
+        self.dest_dir = run_kwargs['dest_dir']
+        self.manage_others = run_kwargs['manage_others']
+        self.duplicates = run_kwargs['duplicates']
+        self.matcher = SubjectMatcher(run_kwargs['subjects'], self.dest_dir)
+        self.totals = new_report()
+        self.totals["logs"] = deque(maxlen=WATCH_LOG_LIMIT) # Solo los más recientes
+        self.backend_name = None
+        self.last_run = None # Bitácora del último lote que movió algo
+        self.started = time.time()
+        self._stop = threading.Event()
+        self._pending = {} # nombre -> (último cambio visto, (tamaño, mtime))
+        self._thread = threading.Thread(target=self._run, name=f"watch-{self.profile_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def status(self) -> dict:
+        totals = self.totals
+        return {
+            "profile_id": self.profile_id,
+            "activo": self.running,
+            "modo": self.backend_name,
+            "movidos": totals["movidos"],
+            "renombrados": totals["renombrados"],
+            "duplicados": totals["duplicados"],
+            "omitidos": totals["omitidos"],
+            "pendientes": len(self._pending),
+            "corrida": self.last_run,
+            "logs": list(totals["logs"]),
+        }
+
+    def _run(self):
+        other_dir = self.dest_dir / "Otros" if self.manage_others == 'mover' else None
+        try:
+            for folder in self.matcher.folders + ([other_dir] if other_dir else []):
+                os.makedirs(folder, exist_ok=True)
+            backend = make_watch_backend(self.source_dir)
+        except OSError as e:
+            self.totals["logs"].append(f"ERROR al iniciar la vigilancia: {e}")
+            return
+        self.backend_name = "inotify" if isinstance(backend, _InotifyBackend) else "revision_periodica"
+        self.totals["logs"].append(f"Vigilando: {self.source_dir} ({self.backend_name})")
+        try:
+            while not self._stop.is_set():
+                changed = backend.wait(WATCH_DEBOUNCE / 2)
+                if changed is None: # Se perdieron eventos: revisar todo lo que hay
+                    changed = {e.name for e in iter_source_items(self.source_dir)}
+                now = time.monotonic()
+                for name in changed:
+                    if not self._ignored(name):
+                        previous = self._pending.get(name)
+                        self._pending[name] = (now, previous[1] if previous else None)
+                ready = self._ready_names(now)
+                if ready:
+                    self._organize(ready, other_dir)
+        except Exception as e:
+            self.totals["logs"].append(f"ERROR CRÍTICO en la vigilancia: {e}")
+        finally:
+            backend.close()
+
+    def _ignored(self, name: str) -> bool:
+        # Descargas a medias, y la propia carpeta principal si vive dentro del origen
+        return (name.lower().endswith(WATCH_IGNORED_SUFFIXES) or
+                (self.source_dir / name) == self.dest_dir)
+
+    def _ready_names(self, now: float) -> list:
+        """Nombres sin avisos durante WATCH_DEBOUNCE segundos y con tamaño/fecha estables."""
+        ready = []
+        for name, (last_change, last_info) in list(self._pending.items()):
+            if now - last_change < WATCH_DEBOUNCE:
+                continue
+            try:
+                st = os.lstat(self.source_dir / name)
+            except OSError:
+                del self._pending[name] # Ya no existe (se borró o se renombró)
+                continue
+            info = (st.st_size, st.st_mtime_ns)
+            if info != last_info:
+                # Primera revisión, o siguió creciendo sin avisar: esperar otra ronda
+                self._pending[name] = (now, info)
+                continue
+            ready.append(name)
+            del self._pending[name]
+        return sorted(ready)
+
+    def _organize(self, names: list, other_dir: Path):
+        entries = []
+        for name in names:
+            try:
+                entries.append(_PathEntry(self.source_dir / name))
+            except OSError:
+                pass
+        report = new_report()
+        # Si hay una corrida manual del mismo perfil, la vigilancia espera a que termine
+        with profile_run_lock(self.profile_id):
+            journal = MoveJournal.start(self.profile_id, self.source_dir, self.dest_dir)
+            executor = MoveExecutor(report, self.source_dir, 1, self.profile_id, self.duplicates, journal)
+            try:
+                dispatch_entries(classify_items(entries, self.matcher, other_dir), executor, report)
+            except Exception as e:
+                executor.close()
+                if journal is not None:
+                    journal.close(error=str(e))
+                raise
+            executor.close()
+            if journal is not None:
+                journal.close()
+                if not journal.discarded:
+                    self.last_run = journal.run_id
+        for key in ("movidos", "renombrados", "duplicados", "omitidos", "escaneados"):
+            self.totals[key] += report[key]
+        self.totals["logs"].extend(report["logs"].tail(WATCH_LOG_LIMIT))
+        if report["movidos"]:
+            finish_profile_run(self.profile, report)
+
+WATCHERS = {}
+WATCHERS_LOCK = threading.Lock()
+
+@app.route('/api/watch/start', methods=['POST'])
+def api_watch_start():
+    """Empieza a vigilar la carpeta de origen de un perfil."""
+    data = request.json
+    print(f"Petición recibida: /api/watch/start (ID: {data.get('id')})")
+
+    profile, run_kwargs, error = prepare_profile_run({'id': data.get('id'), 'duplicados': data.get('duplicados')})
+    if error:
+        return jsonify({"success": False, "error": error[0]}), error[1]
+
+    with WATCHERS_LOCK:
+        watcher = WATCHERS.get(profile['id_perfil'])
+        if watcher is not None and watcher.running:
+            return jsonify({"success": True, "vigilancia": watcher.status()})
+        watcher = WATCHERS[profile['id_perfil']] = FolderWatcher(profile, run_kwargs)
+        watcher.start()
+    log_admin_action("WATCH_START", profile_id=profile['id_perfil'])
+    return jsonify({"success": True, "vigilancia": watcher.status()})
+
+@app.route('/api/watch/stop', methods=['POST'])
+def api_watch_stop():
+    """Deja de vigilar la carpeta de un perfil."""
+    data = request.json
+    with WATCHERS_LOCK:
+        watcher = WATCHERS.pop(data.get('id'), None)
+    if watcher is None:
+        return jsonify({"success": False, "error": "Ese perfil no se está vigilando."}), 404
+    watcher.stop()
+    return jsonify({"success": True, "vigilancia": watcher.status()})
+
+@app.route('/api/watch/status', methods=['GET'])
+def api_watch_status():
+    """Estado de todas las vigilancias activas."""
+    with WATCHERS_LOCK:
+        watchers = list(WATCHERS.values())
+    return jsonify([w.status() for w in watchers])
+
 
 # --- (NUEVO) Función para abrir el navegador ---
 def open_browser():
-    """Abre el navegador en nuestra app después de 1 segundo."""
-    def _open():
-        time.sleep(1)
-        webbrowser.open_new('http://127.0.0.1:5000/')
-    # Iniciar en un hilo separado para no bloquear el servidor
-    threading.Thread(target=_open).start()
+    """Abre el navegador en nuestra app. Se llama cuando el puerto ya está escuchando."""
+    def run():
+        import webbrowser
+        webbrowser.open_new(f'http://{SERVER_HOST}:{SERVER_PORT}/')
+        mark_startup("navegador")
+    # En un hilo separado: webbrowser puede tardar y no debe retrasar al servidor
+    threading.Thread(target=run, name="abrir-navegador", daemon=True).start()
+
+# --- Precalentamiento ---
+# Lo que no hace falta para abrir el puerto corre en segundo plano DESPUÉS de
+# abrirlo: el navegador ya está cargando mientras tanto.
+
+def warm_up():
+    """Crea/actualiza el log de admin, lee los perfiles y compila la plantilla."""
+    try:
+        log_admin_action("APP_START") # El hilo del log corre setup_admin_log antes de escribir
+        PROFILE_STORE.all()
+        app.jinja_env.get_template('index.html')
+    except Exception as e: # Sin precalentar, la primera petición hace el trabajo
+        print_warning(f"No se pudo precalentar la app: {e}")
+    mark_startup("precalentado")
+    print(startup_summary())
+
+def startup_summary() -> str:
+    stages = ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in STARTUP_TIMES.items())
+    return f"Arranque (desde que se cargó app.py): {stages}"
+
+# --- Servidor WSGI ---
+# En vez del servidor de desarrollo de Flask: un servidor con un pool fijo de
+# SERVER_THREADS hilos, así una corrida larga no bloquea las demás peticiones.
+# Usa waitress si está instalado (pip install waitress); si no, el de werkzeug
+# (viene con Flask) con el mismo pool.
+
+class PooledWSGIServer(ThreadedWSGIServer):
+    """ThreadedWSGIServer de werkzeug, pero con un número fijo de hilos en vez de uno por petición."""
+
+    def __init__(self, host: str, port: int, wsgi_app, threads: int):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="http")
+        super().__init__(host, port, wsgi_app)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+def create_server(threads: int = SERVER_THREADS):
+    """Crea el servidor y abre el puerto. Devuelve (servidor, nombre)."""
+    try:
+        from waitress import create_server as waitress_server
+    except ImportError:
+        return PooledWSGIServer(SERVER_HOST, SERVER_PORT, app, threads), "werkzeug"
+    return waitress_server(app, host=SERVER_HOST, port=SERVER_PORT, threads=threads), "waitress"
+
+def _server_already_running() -> bool:
+    try:
+        with socket.create_connection((SERVER_HOST, SERVER_PORT), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+def serve(threads: int = SERVER_THREADS):
+    """Abre el puerto, abre el navegador en cuanto el puerto está listo y atiende peticiones."""
+    if _server_already_running():
+        # Por ejemplo, doble clic en el .bat con la app ya abierta: solo se abre el navegador
+        print_warning(f"La app ya está abierta en el puerto {SERVER_PORT}.")
+        open_browser()
+        return
+    server, server_name = create_server(threads)
+    mark_startup("puerto_abierto")
+    print_success(f"Servidor listo en http://{SERVER_HOST}:{SERVER_PORT}/ ({server_name}, {threads} hilos)")
+    open_browser()
+    threading.Thread(target=warm_up, name="precalentar", daemon=True).start()
+    try:
+        if server_name == "waitress":
+            server.run()
+        else:
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server_name == "waitress":
+            server.close()
+        else:
+            server.server_close()
+
+mark_startup("modulo")
 
 # --- (NUEVO) Punto de Entrada de Flask ---
-if __name__ == "__main__":
+def main():
+    """
+    Arranque de la app. DesShufle.bat la llama con 'import app; app.main()' en vez
+    de 'py app.py': así Python usa el app.pyc guardado y no recompila este archivo
+    en cada arranque.
+    """
     print("Iniciando Organizador de Archivos (v6.0 - Web)...")
-    # 1. Configurar log de admin
-    setup_admin_log()
-    # 2. Registrar inicio
-    log_admin_action("APP_START")
-    # 3. Abrir el navegador
-    open_browser()
-    # 4. Iniciar el servidor web
-    # (debug=False es para producción, debug=True es para desarrollar)
-    app.run(host='127.0.0.1', port=5000, debug=False)
+    # El log de admin y los perfiles se preparan en segundo plano (warm_up), después
+    # de abrir el puerto; el navegador se abre en cuanto el puerto está listo
+    # (para desarrollar: app.run(host=SERVER_HOST, port=SERVER_PORT, debug=True))
+    serve()
+
+if __name__ == "__main__":
+    main()
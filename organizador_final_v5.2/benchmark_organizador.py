@@ -0,0 +1,291 @@
+# --- benchmark_organizador.py ---
+# Mide cuánto tarda cada etapa del organizador con carpetas de prueba
+# generadas al azar (en una carpeta temporal, nunca en tus archivos).
+#
+# USO:
+#    python benchmark_organizador.py --archivos 20000 --salida base.json
+#    (cambias algo en app.py)
+#    python benchmark_organizador.py --archivos 20000 --comparar base.json
+#
+# Con --comparar, el script termina con código 1 si alguna etapa quedó
+# más lenta que la tolerancia (por defecto 20%).
+# -----------------------------------------------------------------
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# app.py guarda perfiles y logs en AppData/ProgramData: durante la prueba
+# se redirigen a una carpeta temporal ANTES de importarlo.
+BENCH_DIR = Path(tempfile.mkdtemp(prefix="benchmark_organizador_"))
+os.environ['APPDATA'] = str(BENCH_DIR / "appdata")
+os.environ['PROGRAMDATA'] = str(BENCH_DIR / "programdata")
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import app  # noqa: E402
+
+BENCHMARK_VERSION = 1
+BASE_SUBJECTS = [
+    "Cálculo Diferencial", "Física", "Química Orgánica", "Álgebra Lineal", "Programación",
+    "Economía", "Historia de México", "Inglés", "Biología", "Estadística", "Ética",
+    "Diseño Gráfico", "Filosofía", "Geografía", "Electrónica", "Comunicación Oral",
+]
+PREFIXES = ["Tarea", "Apuntes", "Examen", "Resumen", "Práctica", "Exposición", "Proyecto", "Lectura"]
+UNRELATED_NAMES = ["IMG", "captura de pantalla", "descarga", "factura", "canción", "meme", "scan"]
+EXTENSIONS = [".pdf", ".docx", ".pptx", ".txt", ".jpg", ".xlsx"]
+
+
+# --- Generación de carpetas de prueba ---
+
+def build_subjects(count: int) -> list:
+    """Materias con acentos. Si se piden más que la lista base, se agregan "II", "III"..."""
+    subjects = []
+    level = 1
+    while len(subjects) < count:
+        for subject in BASE_SUBJECTS:
+            subjects.append(subject if level == 1 else f"{subject} {'I' * level}")
+            if len(subjects) == count:
+                break
+        level += 1
+    return subjects
+
+def strip_accents(text: str) -> str:
+    return app._strip_accents_nfd(text)
+
+def random_file_names(args, subjects: list, rng: random.Random) -> list:
+    """Nombres de archivo con la distribución pedida (sin repetir dentro del origen)."""
+    if args.distribucion == 'zipf': # Pocas materias concentran casi todos los archivos
+        weights = [1 / (i + 1) for i in range(len(subjects))]
+    else:
+        weights = [1] * len(subjects)
+    names = []
+    for i in range(args.archivos):
+        if rng.random() < args.sin_coincidencia:
+            base = f"{rng.choice(UNRELATED_NAMES)} {i}"
+        else:
+            subject = rng.choices(subjects, weights)[0]
+            if rng.random() >= args.acentos:
+                subject = strip_accents(subject)
+            subject = rng.choice([subject, subject.lower(), subject.upper()])
+            base = f"{rng.choice(PREFIXES)} {subject} {i}"
+        names.append(base + rng.choice(EXTENSIONS))
+    return names
+
+def generate_tree(args, root: Path, subjects_normalized: list, names: list, seed: int):
+    """
+    Crea origen/ con los archivos y destino/ vacío, salvo una fracción de
+    nombres (--duplicados) que ya existe en su carpeta destino para forzar "(n)".
+    """
+    rng = random.Random(seed)
+    source_dir = root / "origen"
+    dest_dir = root / "destino" / "Materias"
+    os.makedirs(source_dir)
+    os.makedirs(dest_dir)
+    payload = b"x" * args.tamano
+    for name in names:
+        with open(source_dir / name, 'wb') as f:
+            f.write(payload)
+
+    matcher = app.SubjectMatcher(subjects_normalized, dest_dir)
+    other_dir = dest_dir / "Otros"
+    for entry in app.classify_items(app.iter_source_items(source_dir), matcher, other_dir):
+        if entry.destination is not None and rng.random() < args.duplicados:
+            os.makedirs(entry.destination, exist_ok=True)
+            with open(entry.destination / entry.name, 'wb') as f:
+                f.write(payload)
+    return source_dir, dest_dir
+
+
+# --- Medición ---
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+def summarize(times: list, items: int) -> dict:
+    best = min(times)
+    return {
+        "min_s": round(best, 6),
+        "mediana_s": round(statistics.median(times), 6),
+        "items": items,
+        "items_por_segundo": round(items / best, 1) if best > 0 else None,
+    }
+
+def bench_pipeline(args, subjects_normalized: list, names: list) -> dict:
+    """Escanear, clasificar, resolver nombres y mover, sobre un árbol nuevo en cada repetición."""
+    stages = {key: [] for key in ("escanear", "clasificar", "clasificar_cache", "resolver_nombres",
+                                  "resolver_nombres_disco", "mover", "corrida_completa")}
+    counts = {}
+    for repetition in range(args.repeticiones):
+        root = Path(tempfile.mkdtemp(dir=BENCH_DIR))
+        source_dir, dest_dir = generate_tree(args, root, subjects_normalized, names, args.semilla + repetition)
+        matcher = app.SubjectMatcher(subjects_normalized, dest_dir)
+        other_dir = dest_dir / "Otros"
+
+        elapsed, items = timed(lambda: list(app.iter_source_items(source_dir)))
+        stages["escanear"].append(elapsed)
+        counts["escanear"] = len(items)
+
+        app._normalize_cached.cache_clear() # Primera corrida: caché de nombres vacía
+        elapsed, entries = timed(lambda: list(app.classify_items(items, matcher, other_dir)))
+        stages["clasificar"].append(elapsed)
+        elapsed, _ = timed(lambda: list(app.classify_items(items, matcher, other_dir)))
+        stages["clasificar_cache"].append(elapsed)
+        to_move = [entry for entry in entries if entry.skip_reason is None]
+        counts["clasificar"] = counts["clasificar_cache"] = len(entries)
+
+        def resolve_with_index():
+            indexes = {}
+            for entry in to_move:
+                index = indexes.get(entry.destination)
+                if index is None:
+                    index = indexes[entry.destination] = app.DestinationIndex(entry.destination)
+                index.add(index.resolve(entry.name), entry.is_file)
+        elapsed, _ = timed(resolve_with_index)
+        stages["resolver_nombres"].append(elapsed)
+        elapsed, _ = timed(lambda: [app.handle_duplicates(entry.destination / entry.name) for entry in to_move])
+        stages["resolver_nombres_disco"].append(elapsed)
+        counts["resolver_nombres"] = counts["resolver_nombres_disco"] = len(to_move)
+
+        # Mover: se aplica un plan ya calculado, así solo se mide la fase de movimientos
+        plan = app.plan_organization(source_dir, dest_dir, subjects_normalized, 'mover')
+        elapsed, report = timed(lambda: app.organize_by_subject(
+            source_dir, dest_dir, subjects_normalized, 'mover', workers=args.hilos, plan=plan))
+        stages["mover"].append(elapsed)
+        counts["mover"] = report["movidos"]
+        shutil.rmtree(root, ignore_errors=True)
+
+        # Corrida completa (lo que siente el usuario), sobre otro árbol idéntico
+        root = Path(tempfile.mkdtemp(dir=BENCH_DIR))
+        source_dir, dest_dir = generate_tree(args, root, subjects_normalized, names, args.semilla + repetition)
+        app._normalize_cached.cache_clear()
+        elapsed, report = timed(lambda: app.organize_by_subject(
+            source_dir, dest_dir, subjects_normalized, 'mover', workers=args.hilos))
+        stages["corrida_completa"].append(elapsed)
+        counts["corrida_completa"] = report["escaneados"]
+        shutil.rmtree(root, ignore_errors=True)
+
+    return {stage: summarize(times, counts[stage]) for stage, times in stages.items()}
+
+def bench_profiles(args, subjects_normalized: list) -> dict:
+    """load_profiles / save_profiles con --perfiles perfiles sintéticos."""
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    profiles = {}
+    for i in range(args.perfiles):
+        profile_id = f"bench{i:06d}"
+        profiles[profile_id] = {
+            'id_perfil': profile_id, 'nombre_visible': f"Semestre {i}",
+            'lista_materias_pipe': app.MATERIAS_SEPARATOR.join(subjects_normalized),
+            'ruta_origen': str(BENCH_DIR / "origen"), 'ruta_destino': str(BENCH_DIR / "destino"),
+            'nombre_carpeta_principal': "Materias", 'ultimo_uso_timestamp': now,
+            'creado_en_timestamp': now, 'contador_archivos_movidos': i, 'manejo_otros': 'mover',
+        }
+    save_times, load_times = [], []
+    for _ in range(args.repeticiones):
+        elapsed, _ = timed(lambda: app.save_profiles(profiles))
+        save_times.append(elapsed)
+        elapsed, loaded = timed(app.load_profiles)
+        load_times.append(elapsed)
+        assert len(loaded) == len(profiles), "load_profiles no devolvió todos los perfiles"
+    return {
+        "guardar_perfiles": summarize(save_times, len(profiles)),
+        "cargar_perfiles": summarize(load_times, len(profiles)),
+    }
+
+
+# --- Comparación con una corrida anterior ---
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    """Imprime la diferencia por etapa. Devuelve False si alguna empeoró más que la tolerancia."""
+    with open(baseline_path, mode='r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("configuracion") != results["configuracion"]:
+        print("AVISO: la configuración de la corrida base es distinta; la comparación es aproximada.")
+    ok = True
+    print(f"\n{'Etapa':<24}{'Base (s)':>12}{'Ahora (s)':>12}{'Cambio':>10}")
+    for stage, current in results["etapas"].items():
+        previous = baseline.get("etapas", {}).get(stage)
+        if previous is None or not previous["min_s"]:
+            print(f"{stage:<24}{'-':>12}{current['min_s']:>12.4f}{'nueva':>10}")
+            continue
+        change = current["min_s"] / previous["min_s"] - 1
+        flag = ""
+        if change > tolerance:
+            flag = "  <-- MÁS LENTO"
+            ok = False
+        print(f"{stage:<24}{previous['min_s']:>12.4f}{current['min_s']:>12.4f}{change:>+10.1%}{flag}")
+    return ok
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark del organizador de materias.")
+    parser.add_argument('--archivos', type=int, default=5000, help="Archivos en la carpeta de origen.")
+    parser.add_argument('--materias', type=int, default=8, help="Materias del perfil de prueba.")
+    parser.add_argument('--distribucion', choices=['uniforme', 'zipf'], default='zipf',
+                        help="Cómo se reparten los archivos entre materias.")
+    parser.add_argument('--acentos', type=float, default=0.7,
+                        help="Fracción de nombres que conservan acentos (0 a 1).")
+    parser.add_argument('--sin-coincidencia', dest='sin_coincidencia', type=float, default=0.2,
+                        help="Fracción de archivos que no coinciden con ninguna materia.")
+    parser.add_argument('--duplicados', type=float, default=0.1,
+                        help="Fracción de archivos cuyo nombre ya existe en el destino.")
+    parser.add_argument('--tamano', type=int, default=1024, help="Bytes de cada archivo.")
+    parser.add_argument('--hilos', type=int, default=1, help="Hilos para mover (como 'hilos' en la API).")
+    parser.add_argument('--perfiles', type=int, default=1000, help="Perfiles para cargar/guardar.")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados.")
+    parser.add_argument('--comparar', help="JSON de una corrida anterior para comparar.")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="Con --comparar: qué tanto más lento se acepta (0.2 = 20%%).")
+    return parser.parse_args()
+
+def main() -> int:
+    args = parse_args()
+    subjects = build_subjects(args.materias)
+    # Los perfiles guardan las materias ya normalizadas (ver /api/create-profile)
+    subjects_normalized = [app.normalize_text(subject) for subject in subjects]
+    names = random_file_names(args, subjects, random.Random(args.semilla))
+
+    config = {key: value for key, value in vars(args).items()
+              if key not in ('salida', 'comparar', 'tolerancia')}
+    print(f"Benchmark con {args.archivos} archivos, {args.materias} materias, "
+          f"{args.repeticiones} repeticiones (carpeta temporal: {BENCH_DIR})")
+    try:
+        stages = bench_pipeline(args, subjects_normalized, names)
+        stages.update(bench_profiles(args, subjects_normalized))
+    finally:
+        app.ADMIN_LOG.close() # Vaciar el log de admin antes de borrar la carpeta temporal
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+    results = {
+        "version": BENCHMARK_VERSION,
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "entorno": {"python": platform.python_version(), "sistema": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "configuracion": config,
+        "etapas": stages,
+    }
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, mode='w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"Resultados guardados en {args.salida}")
+    else:
+        print(text)
+
+    if args.comparar and not compare(results, args.comparar, args.tolerancia):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
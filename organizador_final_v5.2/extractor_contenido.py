@@ -0,0 +1,122 @@
+# --- extractor_contenido.py ---
+# Saca un poco de texto del INICIO de un archivo para poder clasificarlo por
+# contenido (app.py -> ContentClassifier) cuando el nombre no dice nada,
+# por ejemplo "scan_0042.pdf".
+#
+# Estas funciones corren dentro de un pool de procesos, así que no dependen
+# de Flask ni de nada de app.py. Solo usan la librería estándar.
+# -----------------------------------------------------------------
+
+import codecs
+import mmap
+import os
+import re
+import zipfile
+import zlib
+
+# Extensiones que sabemos leer
+TEXT_EXTENSIONS = {'.txt', '.md', '.csv', '.tex', '.html', '.htm', '.rtf', '.py', '.java', '.c', '.cpp'}
+OFFICE_EXTENSIONS = {
+    '.docx': ('word/document.xml',),
+    '.pptx': ('ppt/slides/slide1.xml', 'ppt/slides/slide2.xml', 'ppt/slides/slide3.xml'),
+    '.xlsx': ('xl/sharedStrings.xml',),
+    '.odt': ('content.xml',),
+}
+SUPPORTED_EXTENSIONS = TEXT_EXTENSIONS | set(OFFICE_EXTENSIONS) | {'.pdf'}
+
+_PDF_STREAM_RE = re.compile(rb'stream\r?\n(.*?)\r?\nendstream', re.DOTALL)
+_PDF_TEXT_RE = re.compile(rb'\(((?:\\.|[^\\)])*)\)\s*(?:Tj|\')|\[((?:[^\]\\]|\\.)*)\]\s*TJ')
+_PDF_STRING_RE = re.compile(rb'\(((?:\\.|[^\\)])*)\)')
+_PDF_ESCAPE_RE = re.compile(rb'\\([nrtbf()\\]|[0-7]{1,3})')
+_PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+                b'(': b'(', b')': b')', b'\\': b'\\'}
+_XML_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def extract_text(path: str, limit: int) -> str:
+    """
+    Texto de los primeros 'limit' bytes del archivo (o "" si no se puede).
+    Nunca lanza excepciones: un archivo raro simplemente no aporta texto.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension in TEXT_EXTENSIONS:
+            return _decode(_read_head(path, limit))
+        if extension == '.pdf':
+            return _pdf_text(_read_head(path, limit), limit)
+        if extension in OFFICE_EXTENSIONS:
+            return _office_text(path, OFFICE_EXTENSIONS[extension], limit)
+    except (OSError, ValueError, zipfile.BadZipFile, zlib.error):
+        pass
+    return ""
+
+
+def _read_head(path: str, limit: int) -> bytes:
+    """Los primeros 'limit' bytes, mapeando el archivo en memoria (sin leerlo entero)."""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[:min(size, limit)]
+
+
+def _decode(data: bytes) -> str:
+    # El corte en 'limit' puede partir un carácter de varios bytes al final:
+    # el decodificador incremental lo deja pendiente en vez de fallar
+    try:
+        return codecs.getincrementaldecoder('utf-8')().decode(data, final=False)
+    except UnicodeDecodeError:
+        return data.decode('latin-1') # Archivos viejos de Windows
+
+
+def _pdf_text(head: bytes, limit: int) -> str:
+    """
+    Texto de los streams del inicio del PDF. Los streams comprimidos
+    (FlateDecode, lo más común) se descomprimen con zlib; del contenido se
+    toman las cadenas que se dibujan con Tj / TJ.
+    """
+    pieces = []
+    total = 0
+    for match in _PDF_STREAM_RE.finditer(head):
+        raw = match.group(1)
+        try:
+            content = zlib.decompressobj().decompress(raw, limit)
+        except zlib.error:
+            content = raw
+        for text_match in _PDF_TEXT_RE.finditer(content):
+            if text_match.group(1) is not None:
+                strings = [text_match.group(1)]
+            else:
+                strings = _PDF_STRING_RE.findall(text_match.group(2))
+            for string in strings:
+                piece = _PDF_ESCAPE_RE.sub(_pdf_unescape, string)
+                pieces.append(piece)
+                total += len(piece)
+        pieces.append(b" ")
+        if total >= limit:
+            break
+    return _decode(b"".join(pieces))
+
+
+def _pdf_unescape(match) -> bytes:
+    code = match.group(1)
+    if code in _PDF_ESCAPES:
+        return _PDF_ESCAPES[code]
+    return bytes([int(code, 8) & 0xFF])
+
+
+def _office_text(path: str, members: tuple, limit: int) -> str:
+    """Texto de los XML internos de un documento de Office (un .zip), hasta 'limit' bytes."""
+    pieces = []
+    remaining = limit
+    with zipfile.ZipFile(path) as archive:
+        names = set(archive.namelist())
+        for member in members:
+            if member not in names or remaining <= 0:
+                continue
+            with archive.open(member) as f:
+                data = f.read(remaining)
+            remaining -= len(data)
+            pieces.append(_XML_TAG_RE.sub(' ', _decode(data)))
+    return " ".join(pieces)
@@ -0,0 +1,98 @@
+# --- test_normalize_text.py ---
+# normalize_text (tabla latina + caché) debe dar EXACTAMENTE lo mismo que la
+# versión original con NFD. Se compara con barridos exhaustivos de los
+# rangos latinos y con textos Unicode al azar (semilla fija: reproducible).
+#
+#   python -m pytest -q   (o: python -m unittest discover tests)
+# -----------------------------------------------------------------
+
+import os
+import random
+import re
+import sys
+import tempfile
+import unicodedata
+import unittest
+
+# app.py no escribe nada al importarse, pero por si acaso: nada en el AppData real
+os.environ.setdefault('APPDATA', tempfile.mkdtemp())
+os.environ.setdefault('PROGRAMDATA', tempfile.mkdtemp())
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+def original_normalize_text(text: str) -> str:
+    """La normalize_text de v5.2, tal cual."""
+    if not isinstance(text, str):
+        return ""
+    text = ''.join(
+        c for c in unicodedata.normalize('NFD', text.lower())
+        if unicodedata.category(c) != 'Mn'
+    )
+    text = re.sub(r'[^a-z0-9\._]+', '_', text).strip('_')
+    return text
+
+
+# Letras de otros alfabetos, marcas sueltas, puntuación, emojis...
+RANDOM_POOLS = [
+    [chr(c) for c in range(0x20, 0x7F)],
+    [chr(c) for c in range(0xA0, 0x250)],
+    [chr(c) for c in range(0x300, 0x370)],
+    [chr(c) for c in range(0x1E00, 0x1F00)],
+    [chr(c) for c in range(0x2000, 0x2070)],
+    [chr(c) for c in range(0x370, 0x530)],   # Griego y cirílico
+    [chr(c) for c in range(0xAC00, 0xAD00)], # Hangul (NFD lo descompone)
+    [chr(c) for c in range(0x3040, 0x3100)], # Kana (con marcas combinables)
+    ['ß', 'İ', 'K', 'ﬁ', 'ẞ', '\U0001F600', '\U0001D400', 'İ', 'ǅ'],
+]
+
+
+class NormalizeTextEquivalenceTest(unittest.TestCase):
+
+    def assertSameAsOriginal(self, text: str):
+        self.assertEqual(app.normalize_text(text), original_normalize_text(text), repr(text))
+
+    def test_every_latin_code_point(self):
+        for first, last in app._LATIN_RANGES:
+            for code in range(first, last + 1):
+                char = chr(code)
+                self.assertSameAsOriginal(char)
+                self.assertSameAsOriginal(f"Tarea {char}{char.upper()} final.pdf")
+                self.assertSameAsOriginal(char + '\u0301') # Con acento agudo combinable
+
+    def test_every_bmp_code_point(self):
+        for code in range(0x10000):
+            if 0xD800 <= code <= 0xDFFF: # Surrogates sueltos: no son texto
+                continue
+            self.assertSameAsOriginal(f"a{chr(code)}b")
+
+    def test_random_unicode_strings(self):
+        rnd = random.Random(20240514)
+        for _ in range(20000):
+            pool = rnd.choice(RANDOM_POOLS)
+            mixed = rnd.random() < 0.5
+            length = rnd.randint(0, 40)
+            text = ''.join(rnd.choice(rnd.choice(RANDOM_POOLS) if mixed else pool) for _ in range(length))
+            self.assertSameAsOriginal(text)
+
+    def test_long_texts_skip_the_cache(self):
+        rnd = random.Random(7)
+        for _ in range(50):
+            text = ''.join(rnd.choice(rnd.choice(RANDOM_POOLS))
+                           for _ in range(app.NORMALIZE_CACHE_MAX_LENGTH + rnd.randint(1, 500)))
+            self.assertSameAsOriginal(text)
+
+    def test_cached_result_is_stable(self):
+        for text in ("Cálculo Diferencial", "FÍSICA—II", "Ärger über Übungen", ""):
+            first = app.normalize_text(text)
+            self.assertEqual(app.normalize_text(text), first)
+            self.assertEqual(first, original_normalize_text(text))
+
+    def test_non_text_input(self):
+        for value in (None, 42, b"calculo", ["calculo"]):
+            self.assertEqual(app.normalize_text(value), "")
+
+
+if __name__ == "__main__":
+    unittest.main()